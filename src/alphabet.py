@@ -0,0 +1,13 @@
+"""Знаки для показа символов ленты: номер символа -> знак. ПУСТО -- пробел, ПРОБЕЛ -- ␣"""
+
+symbols = [' ', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+           'А', 'Б', 'В', 'Г', 'Д', 'Е', 'Ё', 'Ж', 'З','И', 'Й', 'К',
+           'Л', 'М', 'Н', 'О', 'П', 'Р', 'С', 'Т', 'У', 'Ф', 'Х',
+           'Ц', 'Я', 'Ш', 'Щ', 'Ъ', 'Ы', 'Ь', 'Э', 'Ю', 'Я', '␣',
+           '-', '+', '/', '*', '=', '<', '>', '(', ')', '[', ']', '{', '}', '.',
+           ',', '!', '?', ';', ':', '\'', '"', '#', '|', '$', '%', '~', '@']
+
+# Знак -> номер символа. Я встречается в алфавите дважды, берётся первый номер
+codes = {}
+for _code, _sign in enumerate(symbols):
+    codes.setdefault(_sign, _code)
@@ -0,0 +1,145 @@
+"""
+Пакетная проверка: каждая программа выполняется на каждой ленте из набора.
+
+    $ python -m src.batch a.kor b.kor --command Тест --tapes tapes.txt [--steps N] [--seconds T] [--workers K]
+
+В tapes.txt -- по ленте на строку (как --tape у src.cli). Результаты выводятся по мере готовности,
+по строке JSON на пару (программа, лента).
+
+Каждая программа компилируется один раз, программы .korc не компилируются вовсе. Байт-код и ленты передаются процессам пула один раз, при их запуске
+(initializer), а задание -- только пара номеров.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from . import korc
+from .cli import load_tape, tape_text, error_text
+from .compiler import Compiler
+from .errors import CorrectorException
+from .vm import Vm, Tape, SparseTape, Status, DEFAULT_STEPS
+
+CHUNK = 64  # Наибольшее число заданий в одной посылке процессу пула
+
+# Состояние процесса пула (задаёт _init_worker)
+_programs = []  # (имя, байт-код, команда, загруженная программа и теги или None)
+_tapes = []
+_budget = (DEFAULT_STEPS, None, False, False)  # (шагов, секунд, страничная лента, трансляция)
+_machines = {}  # Номер программы -> Vm: загруженный байт-код переиспользуется между заданиями
+
+
+def _init_worker(programs: list, tapes: list, budget: tuple):
+    global _programs, _tapes, _budget
+    _programs, _tapes, _budget = programs, tapes, budget
+    _machines.clear()
+
+
+def _run_job(job: tuple[int, int]) -> dict:
+    program_id, tape_id = job
+    name, bytecode, command, loaded = _programs[program_id]
+    steps, seconds, sparse, jit = _budget
+
+    vm = _machines.get(program_id)
+    if vm is None:
+        vm = _machines[program_id] = Vm(sparse=sparse, jit=jit)
+        if loaded is not None:
+            vm.use(*loaded, bytecode)
+    vm.box = 0
+    vm.tape = SparseTape() if sparse else Tape()
+    result = {'program': name, 'tape_id': tape_id}
+    try:
+        load_tape(vm.tape, _tapes[tape_id])
+    except ValueError as e:
+        return {**result, 'status': Status.ERROR.value, 'error': e.args[0]}
+
+    status = Status.FINISHED
+    if command:
+        vm.startup(bytecode, command)
+        status = vm.execute(steps=steps, seconds=seconds)
+    first, cells = tape_text(vm.tape)
+    result.update(status=status.value, tape=cells, first=first, position=vm.tape.position, box=vm.box,
+                  steps=vm.steps)
+    if status is Status.ERROR:
+        result['error'] = vm.error.args[0]
+    return result
+
+
+def compile_programs(programs: dict, command: str, optimize: bool = False) -> tuple[list, list]:
+    """programs: имя -> текст или korc.Compiled. Возвращает скомпилированные программы (как _programs)
+    и результаты-ошибки для программ, которые не компилируются
+    """
+    compiled, failed = [], []
+    for name, code in programs.items():
+        try:
+            if isinstance(code, korc.Compiled):
+                compiled.append((name, code.bytecode, korc.compile_command(code, command), (code.program, code.tags)))
+            else:
+                compiler = Compiler(cache_size=0, optimize=optimize)
+                compiler.compile(code)
+                bytecode, command_bytecode, _ = compiler.link(command)  # Только нужные команде теги
+                compiled.append((name, bytecode, command_bytecode, None))
+        except CorrectorException as e:
+            failed.append({'program': name, 'status': Status.ERROR.value, 'error': e.args[0]})
+    return compiled, failed
+
+
+def grade(programs: dict, tapes: list[str], command: str, steps: int = DEFAULT_STEPS, seconds: float = None,
+          workers: int = None, optimize: bool = False, sparse: bool = False, jit: bool = False):
+    """Выполняет command каждой программы на каждой ленте. Результаты -- словари в порядке
+    (программа, лента); workers -- число процессов (по умолчанию по числу доступных ядер, 1 -- без пула)
+    """
+    compiled, failed = compile_programs(programs, command, optimize)
+    yield from failed
+
+    jobs = ((program_id, tape_id) for program_id in range(len(compiled)) for tape_id in range(len(tapes)))
+    budget = (steps, seconds, sparse, jit)
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    if workers <= 1:
+        _init_worker(compiled, tapes, budget)
+        yield from map(_run_job, jobs)
+        return
+
+    # Посылки мельче, если заданий мало: по несколько на процесс, чтобы нагрузка распределялась ровно
+    chunk = max(1, min(CHUNK, len(compiled) * len(tapes) // (workers * 4)))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(compiled, tapes, budget)) as pool:
+        yield from pool.map(_run_job, jobs, chunksize=chunk)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src.batch', description='Пакетная проверка программ')
+    parser.add_argument('programs', nargs='+', help='файлы с программами (.kor или .korc)')
+    parser.add_argument('-c', '--command', required=True, help='команда для выполнения')
+    parser.add_argument('--tapes', required=True, help='файл с лентами, по одной на строку')
+    parser.add_argument('-s', '--steps', type=int, default=DEFAULT_STEPS, help='лимит шагов на задание')
+    parser.add_argument('--seconds', type=float, help='лимит времени на задание, с')
+    parser.add_argument('-j', '--workers', type=int, help='число процессов')
+    parser.add_argument('-O', dest='optimize', action='store_true', help='компиляция с оптимизацией')
+    parser.add_argument('--sparse', action='store_true', help='страничная лента')
+    parser.add_argument('--jit', action='store_true', help='трансляция программ в функции Python')
+    args = parser.parse_args(argv)
+
+    programs = {}
+    for path in args.programs:
+        try:
+            if path.endswith('.korc'):
+                programs[path] = korc.load(path)
+            else:
+                with open(path, encoding='utf-8') as f:
+                    programs[path] = f.read()
+        except ValueError as e:  # Не .korc, старая версия или обрезанный файл
+            print(f'{path}: {error_text(e)}', file=sys.stderr)
+            return 1
+    with open(args.tapes, encoding='utf-8') as f:
+        tapes = f.read().splitlines()
+
+    for result in grade(programs, tapes, args.command, args.steps, args.seconds, args.workers, args.optimize,
+                        args.sparse, args.jit):
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
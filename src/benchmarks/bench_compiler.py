@@ -0,0 +1,33 @@
+"""
+Замер скорости компилятора на больших программах: токенов в секунду без лексера и с ним.
+
+    $ python -m src.benchmarks.bench_compiler [кол-во процедур] [-O]
+
+По умолчанию программа из 5000 процедур -- около 135 тыс. токенов. Кэш компиляции выключен.
+"""
+import sys
+
+from .programs import generate_program
+from .suite import best_time
+from ..compiler import Compiler
+
+
+def main(procedures: int = 5000, optimize: bool = False):
+    code = generate_program(procedures)
+    compiler = Compiler(cache_size=0, optimize=optimize)
+    tokens = list(compiler.parser.parse(code))
+
+    def handle():
+        compiler.reset()
+        for tok in tokens:
+            compiler.handle(tok)
+
+    front = best_time(handle, 3)
+    full = best_time(lambda: compiler.compile(code), 3)
+    print(f'Токенов: {len(tokens)}, тегов: {len(compiler.tags)}, байт-код: {len(compiler.compose())} байт')
+    print(f'Разбор токенов (handle): {front:8.1f} мс, {len(tokens) / front / 1e3:.2f} млн токенов/с')
+    print(f'Компиляция целиком:      {full:8.1f} мс, {len(tokens) / full / 1e3:.2f} млн токенов/с')
+
+
+if __name__ == '__main__':
+    main(*map(int, [arg for arg in sys.argv[1:] if arg != '-O']), optimize='-O' in sys.argv[1:])
@@ -0,0 +1,50 @@
+"""
+Вложенные циклы ПОВТОРИ 1000: время компиляции, размер байт-кода и время выполнения.
+
+    $ python -m src.benchmarks.bench_loops [глубина]
+
+Для сравнения компилируется та же программа с развёрнутыми циклами -- так раньше выглядел байт-код ПОВТОРИ
+(тело копировалось столько раз, сколько повторений).
+"""
+import sys
+import time
+
+from ..compiler import Compiler
+from ..vm import Vm
+
+ITERATIONS = 1000
+BODY = '{ ВПРАВО ВЛЕВО }'
+
+
+def nested(depth: int) -> str:
+    return 'ЭТО Программа ' + f'ПОВТОРИ {ITERATIONS} ' * depth + BODY + ' КОНЕЦ'
+
+
+def unrolled(depth: int) -> str:
+    return 'ЭТО Программа ' + 'ВПРАВО ВЛЕВО ' * ITERATIONS ** depth + 'КОНЕЦ'
+
+
+def measure(code: str, run: bool) -> tuple[float, int, float]:
+    compiler = Compiler(cache_size=0)
+    start = time.perf_counter()
+    bytecode = compiler.compile(code)
+    compile_time = time.perf_counter() - start
+
+    run_time = float('nan')
+    if run:
+        start = time.perf_counter()
+        Vm().run(bytecode, compiler.compile_one_command('Программа'))
+        run_time = time.perf_counter() - start
+    return compile_time, len(bytecode), run_time
+
+
+def main(max_depth: int = 2):
+    print(f'{"программа":<22}{"компиляция, мс":>16}{"байт-код, байт":>16}{"выполнение, мс":>16}')
+    for depth in range(1, max_depth + 1):
+        for name, code in ((f'ПОВТОРИ x{depth}', nested(depth)), (f'развёрнутая x{depth}', unrolled(depth))):
+            compile_time, size, run_time = measure(code, run=depth <= 2)
+            print(f'{name:<22}{compile_time * 1000:>16.1f}{size:>16}{run_time * 1000:>16.1f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
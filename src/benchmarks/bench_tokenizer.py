@@ -0,0 +1,80 @@
+"""
+Замер скорости лексера и компилятора.
+
+    $ python -m src.benchmarks.bench_tokenizer [кол-во процедур]
+
+Для сравнения приведён прежний посимвольный лексер (legacy_parse), которым компилятор
+проходил исходный текст дважды.
+"""
+import sys
+
+from .programs import generate_program
+from .suite import best_time
+from ..compiler import Compiler
+from ..compiler.parser import Parser, Token
+
+
+def legacy_parse(parser: Parser, code: str):
+    """Прежний алгоритм: посимвольная сборка токена и линейный поиск по спискам"""
+    line = row = start = 0
+    cur_token = ''
+    in_comment = False
+
+    def get_tok():
+        if cur_token in parser.symbols:
+            return Token('SYMBOL', parser.symbols.index(cur_token), line, start, row)
+        elif cur_token in parser.keywords:
+            return Token('KEYWORD', cur_token, line, start, row)
+        elif cur_token in parser.commands:
+            return Token('COMMAND', cur_token, line, start, row)
+        elif cur_token in parser.checks:
+            return Token('CHECK', cur_token, line, start, row)
+        elif cur_token.isdigit():
+            return Token('NUMBER', int(cur_token), line, start, row)
+        else:
+            return Token('WORD', cur_token, line, start, row)
+
+    for symbol in code.upper():
+        if symbol.isspace():
+            if cur_token and not in_comment:
+                yield get_tok()
+                cur_token = ''
+            if symbol == '\n':
+                row = 0
+                line += 1
+                if in_comment:
+                    cur_token = ''
+                    in_comment = False
+        else:
+            if len(cur_token) == 0:
+                start = row
+            cur_token += symbol
+            if cur_token == '//':
+                in_comment = True
+        if symbol != '\n':
+            row += 1
+    if cur_token and not in_comment:
+        yield get_tok()
+
+
+def main(procedures: int = 5000):
+    code = generate_program(procedures)
+    parser = Parser()
+    compiler = Compiler()
+
+    assert list(legacy_parse(parser, code)) == list(parser.parse(code))
+
+    tokens = sum(1 for _ in parser.parse(code))
+    print(f'Строк: {code.count(chr(10)) + 1}, токенов: {tokens}')
+
+    legacy = best_time(lambda: [list(legacy_parse(parser, code)) for _ in range(2)], 3)  # компилятор вызывал лексер дважды
+    new = best_time(lambda: list(parser.parse(code)), 3)
+    print(f'Лексер (прежний, 2 прохода): {legacy:8.1f} мс')
+    print(f'Лексер (новый, 1 проход):    {new:8.1f} мс  (x{legacy / new:.1f})')
+
+    full = best_time(lambda: compiler.compile(code), 3)
+    print(f'Компиляция целиком:          {full:8.1f} мс')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
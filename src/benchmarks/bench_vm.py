@@ -0,0 +1,50 @@
+"""
+Замер скорости виртуальной машины: команд в секунду и памяти на загруженную команду.
+
+    $ python -m src.benchmarks.bench_vm [кол-во повторений] [-O]
+"""
+import sys
+import time
+
+from ..compiler import Compiler
+from ..vm import Vm
+from ..vm.vm import OPERANDS
+
+PROGRAM = '''
+ЭТО Шаг
+    ПЛЮС ВПРАВО ЯЩИК+ ВЛЕВО ОБМЕН ОБМЕН МИНУС
+    ЕСЛИ Я=Л ТО ВПРАВО ИНАЧЕ { ВЛЕВО ВПРАВО }
+КОНЕЦ
+ЭТО Программа ПИШИ 5 ПОВТОРИ N Шаг КОНЕЦ
+'''
+
+
+def main(iterations: int = 20000, optimize: bool = False):
+    compiler = Compiler(optimize=optimize)
+    bytecode = compiler.compile(PROGRAM.replace('N', str(iterations)))
+    command = compiler.compile_one_command('Программа')
+
+    vm = Vm()
+    start = time.perf_counter()
+    program, _ = vm.load(bytecode)
+    load_time = time.perf_counter() - start
+
+    best = float('inf')
+    for _ in range(3):
+        vm = Vm()
+        start = time.perf_counter()
+        vm.run(bytecode, command)
+        best = min(best, time.perf_counter() - start)
+    steps = vm.steps
+
+    instructions = i = 0
+    while i < len(program):
+        i += 1 + len(OPERANDS[program[i]])
+        instructions += 1
+    print(f'Байт-код: {len(bytecode)} байт, загрузка: {load_time * 1000:.1f} мс')
+    print(f'Память программы: {program.itemsize * len(program) / max(instructions, 1):.1f} байт на команду')
+    print(f'Выполнено команд: {steps} за {best * 1000:.1f} мс, {steps / best / 1e6:.2f} млн команд/с')
+
+
+if __name__ == '__main__':
+    main(*map(int, [arg for arg in sys.argv[1:] if arg != '-O']), optimize='-O' in sys.argv[1:])
@@ -0,0 +1,16 @@
+"""Генераторы больших программ для замеров"""
+
+
+def generate_program(procedures: int = 1000) -> str:
+    """Программа из `procedures` процедур, каждая вызывает предыдущую"""
+    lines = []
+    for i in range(procedures):
+        lines.append(f'ЭТО Процедура{i}  // процедура номер {i}')
+        lines.append('    ВПРАВО ПЛЮС ЯЩИК+ ВЛЕВО ОБМЕН ПИШИ А')
+        lines.append('    ЕСЛИ НЕ ПУСТО ТО { ВПРАВО МИНУС } ИНАЧЕ ВЛЕВО')
+        lines.append('    ПОКА Я#Л ВЛЕВО')
+        lines.append('    ПОВТОРИ 3 ВПРАВО')
+        if i:
+            lines.append(f'    Процедура{i - 1}')
+        lines.append('КОНЕЦ')
+    return '\n'.join(lines)
@@ -0,0 +1,117 @@
+"""
+Набор замеров на программах из corpus/*.kor. В каждой программе точка входа -- процедура Тест.
+
+Для каждой программы замеряются разбор на слова, компиляция, размер байт-кода, загрузка в машину
+и скорость выполнения (лучшее из нескольких повторов).
+
+    $ python -m src.benchmarks.suite [-O] [--jit] [--repeat 5] [--output results.json] [--baseline base.json]
+
+С --baseline результаты сравниваются с сохранёнными ранее: время хуже более чем на --threshold (доля),
+больший байт-код или больше шагов считаются ухудшением, и код выхода тогда 1.
+"""
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+from ..compiler import Compiler
+from ..compiler.parser import Parser
+from ..vm import Vm
+
+CORPUS = pathlib.Path(__file__).with_name('corpus')
+ENTRY = 'Тест'
+TIMES = ('tokenize_ms', 'compile_ms', 'load_ms', 'run_ms')  # Метрики, которые сравниваются с допуском
+SIZES = ('bytecode_bytes', 'steps')  # Метрики, которые не должны расти вовсе
+
+
+def best_time(function, repeat: int) -> float:
+    """Лучшее время вызова function, мс"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def measure(code: str, repeat: int = 5, optimize: bool = False, jit: bool = False) -> dict:
+    parser = Parser()
+    compiler = Compiler(optimize=optimize)
+    bytecode = compiler.compile(code)
+    command = compiler.compile_one_command(ENTRY)
+
+    vm = Vm(jit=jit)
+    vm.run(bytecode, command)  # Заодно транслирует программу: функции берутся из кэша
+    steps = vm.steps
+
+    def run():
+        Vm(jit=jit).run(bytecode, command)
+
+    result = {
+        'tokenize_ms': best_time(lambda: list(parser.parse(code)), repeat),
+        'compile_ms': best_time(lambda: Compiler(cache_size=0, optimize=optimize).compile(code), repeat),
+        'bytecode_bytes': len(bytecode),
+        'load_ms': best_time(lambda: Vm().load(bytecode), repeat),
+        'steps': steps,
+        'run_ms': best_time(run, repeat),
+    }
+    result['steps_per_s'] = steps / max(result['run_ms'], 1e-9) * 1000
+    return result
+
+
+def run_suite(repeat: int = 5, optimize: bool = False, jit: bool = False) -> dict:
+    return {path.stem: measure(path.read_text(encoding='utf-8'), repeat, optimize, jit)
+            for path in sorted(CORPUS.glob('*.kor'))}
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> list[str]:
+    """Ухудшения results относительно baseline, по строке на каждое"""
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for key in TIMES:
+            if key in old and metrics[key] > old[key] * (1 + threshold):
+                regressions.append(f'{name}: {key} {old[key]:.3f} -> {metrics[key]:.3f}')
+        for key in SIZES:
+            if key in old and metrics[key] > old[key]:
+                regressions.append(f'{name}: {key} {old[key]} -> {metrics[key]}')
+    return regressions
+
+
+def report(results: dict) -> str:
+    lines = [f'{"Программа":<12}{"разбор,мс":>11}{"компил.,мс":>12}{"байт":>7}{"загр.,мс":>10}'
+             f'{"шагов":>10}{"вып.,мс":>10}{"млн шаг/с":>11}']
+    for name, m in results.items():
+        lines.append(f'{name:<12}{m["tokenize_ms"]:>11.3f}{m["compile_ms"]:>12.3f}{m["bytecode_bytes"]:>7}'
+                     f'{m["load_ms"]:>10.3f}{m["steps"]:>10}{m["run_ms"]:>10.1f}{m["steps_per_s"] / 1e6:>11.2f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Замеры на программах из corpus/*.kor')
+    parser.add_argument('-O', dest='optimize', action='store_true', help='компиляция с оптимизацией')
+    parser.add_argument('--jit', action='store_true', help='трансляция программ в функции Python')
+    parser.add_argument('--repeat', type=int, default=5, help='повторов каждого замера')
+    parser.add_argument('--output', type=pathlib.Path, help='записать результаты в JSON')
+    parser.add_argument('--baseline', type=pathlib.Path, help='сравнить с результатами из JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='допустимое ухудшение времени (доля)')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.repeat, args.optimize, args.jit)
+    print(report(results))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding='utf-8')), args.threshold)
+        for line in regressions:
+            print('Ухудшение:', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
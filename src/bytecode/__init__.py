@@ -1 +1,2 @@
 from .byte_commands import *
+from .instructions import ARGS_NUM, TAG_ARGS, NUMBER_ARGS, SIGNED_ARGS, SKIP_ARGS, instructions, tag_refs, remap_tags
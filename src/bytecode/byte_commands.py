@@ -16,6 +16,26 @@ POP_JUMP_IF_ELSE = 0x0F
 RETURN = 0x10
 BOOL_NOT = 0x11
 IS_DIGIT = 0x12
+REPEAT = 0x13
+LOOP_NEXT = 0x14
+# Объединённые команды (оптимизатор)
+INC_TAPE = 0x15
+DEC_TAPE = 0x16
+SWAP_BOX = 0x17
+SET_TAPE_IMM = 0x18
+TAPE_EQ_IMM = 0x19
+JUMP_IF_TAPE_EQ = 0x1A
+JUMP_IF_TAPE_NE = 0x1B
+CALL = 0x1C
+MOVE_BY = 0x1D
+ADD_TAPE = 0x1E
+SCAN_RIGHT_UNTIL = 0x1F
+SCAN_LEFT_UNTIL = 0x20
+# Относительные переходы вперёд в подставленном коде (оптимизатор)
+SKIP = 0x21
+SKIP_IF_NOT = 0x22
+SKIP_IF_TAPE_EQ = 0x23
+SKIP_IF_TAPE_NE = 0x24
 
 EQUAL = 0x00
 MORE = 0x01
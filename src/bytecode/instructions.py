@@ -0,0 +1,44 @@
+"""Разбор байт-кода по инструкциям"""
+from .byte_commands import *
+
+ARGS_NUM = {TAG: 2, LOAD_TAG: 2, LOAD_SYMBOL: 1, BIN_OP: 1, RIGHT: 0, LEFT: 0, POP_SET_BOX: 0, LOAD_BOX: 0,
+            POP_SET_TAPE: 0, LOAD_TAPE: 0, POP_NEXT_PUSH: 0, POP_PREV_PUSH: 0, POP_JUMP: 0, POP_JUMP_IF: 2,
+            POP_JUMP_IF_ELSE: 4, RETURN: 0, BOOL_NOT: 0, IS_DIGIT: 0, REPEAT: 4, LOOP_NEXT: 2,
+            INC_TAPE: 0, DEC_TAPE: 0, SWAP_BOX: 0, SET_TAPE_IMM: 1, TAPE_EQ_IMM: 1, JUMP_IF_TAPE_EQ: 3,
+            JUMP_IF_TAPE_NE: 3, CALL: 2, MOVE_BY: 2, ADD_TAPE: 2, SCAN_RIGHT_UNTIL: 1, SCAN_LEFT_UNTIL: 1,
+            SKIP: 2, SKIP_IF_NOT: 2, SKIP_IF_TAPE_EQ: 3, SKIP_IF_TAPE_NE: 3}
+# Смещения (от кода команды) двухбайтовых номеров тегов в аргументах
+TAG_ARGS = {LOAD_TAG: (1,), POP_JUMP_IF: (1,), POP_JUMP_IF_ELSE: (1, 3), REPEAT: (3,), LOOP_NEXT: (1,),
+            JUMP_IF_TAPE_EQ: (2,), JUMP_IF_TAPE_NE: (2,), CALL: (1,)}
+# Смещения остальных двухбайтовых чисел
+NUMBER_ARGS = {REPEAT: (1,)}
+# Смещения двухбайтовых чисел со знаком (дополнительный код)
+SIGNED_ARGS = {MOVE_BY: (1,), ADD_TAPE: (1,)}
+# Смещения двухбайтовых длин перехода вперёд: сколько байт пропустить после конца команды. Всегда последний аргумент
+SKIP_ARGS = {SKIP: (1,), SKIP_IF_NOT: (1,), SKIP_IF_TAPE_EQ: (2,), SKIP_IF_TAPE_NE: (2,)}
+
+
+def instructions(code):
+    """Смещения начала каждой инструкции в байт-коде тега"""
+    i = 0
+    while i < len(code):
+        yield i
+        i += 1 + ARGS_NUM[code[i]]
+
+
+def tag_refs(code):
+    """Номера тегов, на которые ссылается байт-код тега"""
+    for i in instructions(code):
+        for offset in TAG_ARGS.get(code[i], ()):
+            yield (code[i + offset] << 8) + code[i + offset + 1]
+
+
+def remap_tags(code, mapping) -> bytearray:
+    """Копия байт-кода, в которой каждый номер тега tag заменён на mapping[tag]"""
+    result = bytearray(code)
+    for i in instructions(code):
+        for offset in TAG_ARGS.get(code[i], ()):
+            tag = mapping[(code[i + offset] << 8) + code[i + offset + 1]]
+            result[i + offset] = tag >> 8
+            result[i + offset + 1] = tag & 0xFF
+    return result
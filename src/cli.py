@@ -0,0 +1,134 @@
+"""
+Выполнение программы без графического интерфейса:
+
+    $ python -m src.cli program.kor --command ИМЯ [--tape "СЛОВО"] [--steps N] [-O] [--sparse] [--jit] [--timing]
+    $ python -m src.cli program.kor --save program.korc
+
+program.kor -- файл с программой ('-' -- стандартный ввод) или скомпилированная программа .korc (тогда она
+не компилируется), --save -- сохранить скомпилированную программу, --command -- одна команда для выполнения,
+--tape -- начальное содержимое ленты с ячейки 0 (пробел -- ПУСТО, ␣ -- ПРОБЕЛ).
+Печатает ленту, положение каретки, ящик и число шагов. Код выхода: 0 -- выполнено, 1 -- ошибка,
+2 -- исчерпан лимит шагов.
+
+Qt не импортируется, компилятор и машина импортируются только после разбора аргументов. Время от импорта
+модуля до первой команды программы (--timing) должно укладываться в STARTUP_BUDGET.
+"""
+import time
+
+START = time.perf_counter()
+
+import argparse
+import sys
+
+STARTUP_BUDGET = 0.15  # с
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description='Выполнение программы Корректора')
+    parser.add_argument('program', help='файл с программой, - -- стандартный ввод')
+    parser.add_argument('-c', '--command', help='команда для выполнения')
+    parser.add_argument('--save', help='сохранить скомпилированную программу в файл .korc')
+    parser.add_argument('-t', '--tape', default='', help='начальное содержимое ленты')
+    parser.add_argument('-s', '--steps', type=int, help='лимит шагов (по умолчанию DEFAULT_STEPS)')
+    parser.add_argument('-O', dest='optimize', action='store_true', help='компиляция с оптимизацией')
+    parser.add_argument('--sparse', action='store_true', help='страничная лента')
+    parser.add_argument('--jit', action='store_true', help='трансляция программы в функции Python')
+    parser.add_argument('--timing', action='store_true', help='напечатать время запуска')
+    return parser.parse_args(argv)
+
+
+def load_tape(tape, text: str):
+    """Записывает text на ленту с текущей ячейки, каретка возвращается на место"""
+    from .alphabet import codes
+
+    for sign in text:
+        if sign.upper() not in codes:
+            raise ValueError(f'Неизвестный символ ленты: {sign!r}')
+        tape.set(codes[sign.upper()])
+        tape.move_right()
+    tape.move_by(-len(text))
+
+
+def tape_text(tape) -> tuple[int, str]:
+    """Непустая часть ленты вместе с текущей ячейкой: (положение первой ячейки, знаки ячеек)"""
+    from .alphabet import symbols
+
+    position = tape.position
+    first, last = tape.bounds() or (position, position)
+    first, last = min(first, position), max(last, position)
+    return first, ''.join(symbols[tape.get_at(p)] for p in range(first, last + 1))
+
+
+def format_tape(tape) -> str:
+    """Непустая часть ленты и строка с кареткой под текущей ячейкой"""
+    first, cells = tape_text(tape)
+    return f'|{cells}|\n {" " * (tape.position - first)}^'
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    from .compiler import Compiler
+    from .errors import CorrectorException
+    from .vm import Vm, Status, DEFAULT_STEPS
+    from .alphabet import symbols
+
+    from . import korc
+
+    vm = Vm(sparse=args.sparse, jit=args.jit)
+    try:
+        load_tape(vm.tape, args.tape)
+        if args.program.endswith('.korc'):
+            compiled = korc.load(args.program)
+            if args.command is None:
+                return 0
+            command = korc.compile_command(compiled, args.command)
+        else:
+            compiler = Compiler(cache_size=0, optimize=args.optimize)
+            if args.program == '-':
+                bytecode = compiler.compile(sys.stdin)
+            else:
+                with open(args.program, encoding='utf-8') as f:
+                    bytecode = compiler.compile(f)  # Текст читается по строкам, целиком в памяти не держится
+            if args.save is not None:
+                korc.save(args.save, bytecode, compiler.procedures)
+            if args.command is None:
+                return 0
+            bytecode, command, procedures = compiler.link(args.command)  # Только нужные команде теги
+            compiled = korc.Compiled(procedures, None, None, bytecode)
+    except (CorrectorException, ValueError) as e:
+        print(error_text(e), file=sys.stderr)
+        return 1
+
+    status = Status.FINISHED
+    if command:
+        if compiled.program is not None:
+            korc.startup(vm, compiled, command)
+        else:
+            vm.startup(compiled.bytecode, command)
+        if args.timing:
+            startup = time.perf_counter() - START
+            print(f'Запуск: {startup * 1000:.1f} мс (бюджет {STARTUP_BUDGET * 1000:.0f} мс)', file=sys.stderr)
+        status = vm.execute(steps=DEFAULT_STEPS if args.steps is None else args.steps)
+
+    print(format_tape(vm.tape))
+    print(f'Положение: {vm.tape.position}')
+    print(f'Ящик: {symbols[vm.box]!r}')
+    print(f'Шагов: {vm.steps}')
+    if status is Status.ERROR:
+        print(error_text(vm.error), file=sys.stderr)
+        return 1
+    if status is Status.BUDGET:
+        print('Исчерпан лимит шагов', file=sys.stderr)
+        return 2
+    return 0
+
+
+def error_text(e: Exception) -> str:
+    if len(e.args) > 1:  # Синтаксическая ошибка: текст, строка, начало и конец слова
+        return f'{e.args[0]} (строка {e.args[1] + 1}, столбец {e.args[2] + 1})'
+    return e.args[0]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
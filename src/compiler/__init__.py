@@ -1 +1,2 @@
 from .compiler import Compiler
+from .cache import CompileCache, CacheInfo
@@ -0,0 +1,46 @@
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class CompileCache:
+    """LRU-кэш результатов компиляции, ключ -- хэш исходного текста"""
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(code: str) -> bytes:
+        return hashlib.blake2b(code.encode(), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: bytes, entry):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries))
+
+    def clear(self):
+        self.hits = self.misses = 0
+        self.entries.clear()
@@ -1,15 +1,39 @@
-from .parser import Parser
+from typing import NamedTuple
+
+from .parser import Parser, split_procedures
+from .cache import CompileCache
+from . import optimizer
+from . import linker
 from ..errors import CorrectorSyntaxError, CorrectorMemoryError
 from . import stack_elements
 from .. import bytecode as bc
 
 
+class Unit(NamedTuple):
+    """Отдельно скомпилированная процедура.
+
+    Номера тегов в tags местные: 0 -- сама процедура, далее её блоки, далее внешние процедуры из externals.
+    """
+    name: str | int
+    tags: tuple[bytes, ...]
+    externals: tuple[str | int, ...]
+
+
 class Compiler:
-    def __init__(self):
+    def __init__(self, cache_size: int = 32, incremental: bool = False, optimize: bool = False,
+                 inline_size: int = optimizer.INLINE_SIZE):
         self.procedures = {}
         self.tags = []
         self.stack = []
 
+        self.incremental = incremental
+        self.optimize = optimize
+        self.inline_size = inline_size  # Наибольшая длина подставляемого тега при оптимизации, байт
+        self.units = {}  # текст процедуры -> (Unit, номера её тегов в программе, её теги в программе)
+        self.interned = {}  # байт-код завершённого блока ЕСЛИ текущей процедуры -> номер его тега
+        self.definitions = {}  # имя -> номер тега процедуры, в порядке определения
+        self.fixups = {}  # имя процедуры, вызванной до определения -> токен первого вызова
+
         self.commands = {
             'ВПРАВО': (bc.RIGHT,), 'ВЛЕВО': (bc.LEFT,), 'ЯЩИК+': (bc.LOAD_TAPE, bc.POP_SET_BOX),
             'ЯЩИК-': (bc.LOAD_BOX, bc.POP_SET_TAPE),
@@ -23,42 +47,208 @@ class Compiler:
                        'Я#Л': (bc.LOAD_TAPE, bc.LOAD_BOX, bc.BIN_OP, bc.NOT_EQUAL),
                        'ЦИФРА': (bc.LOAD_TAPE, bc.IS_DIGIT)}
 
+        # Тип состояния на вершине стека -> обработчик следующего токена
+        self.handlers = {stack_elements.Procedure: self.handle_procedure,
+                         stack_elements.WriteCommand: self.handle_symbol,
+                         stack_elements.If: self.handle_if,
+                         stack_elements.ForLoop: self.handle_for,
+                         stack_elements.WhileLoop: self.handle_while,
+                         stack_elements.CodeBlock: self.handle_code_block}
+
         self.parser = Parser()
+        self.cache = CompileCache(cache_size)
 
     def reset(self):
         self.procedures = {}
         self.tags = []
         self.stack = []
+        self.interned = {}
+        self.definitions = {}
+        self.fixups = {}
+
+    def compile(self, code) -> bytearray:
+        """code -- текст программы или поток текста (см. Parser.parse: строки потока сохраняют '\\n').
+        Поток читается за один проход и не кэшируется. Возвращаемый байт-код хранится в кэше, изменять его нельзя
+        """
+        if not isinstance(code, str):
+            return self._compile_full(code)
+
+        key = self.cache.key(code)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.stack = []
+            self.procedures, self.tags, bytecode = entry
+            return bytecode
+
+        if self.incremental:
+            bytecode = self._compile_incremental(code)
+        else:
+            bytecode = self._compile_full(code)
+        self.cache.put(key, (self.procedures, self.tags, bytecode))
+        return bytecode
 
-    def startup(self, code):
+    def _compile_full(self, code) -> bytearray:
+        """Один проход по токенам: процедура получает номер тега при первом упоминании, вызовы ещё
+        не определённых процедур проверяются в конце (fixups)
+        """
         self.reset()
 
-        tokens = self.parser.parse(code)
+        tok = self._handle_all(self.parser.parse(code))
 
+        self._check_fixups()
+        if self.stack:
+            raise CorrectorSyntaxError('Незавершённый блок!', tok.line, tok.start, tok.end)
+        self.interned = {}
+
+        self._renumber()
+        self._optimize(range(len(self.tags)))
+        return self.compose()
+
+    def _handle_all(self, tokens):
+        """handle для каждого токена, возвращает последний. Из синтаксической ошибки и вызова так и не
+        определённой процедуры сообщается та, что раньше в тексте, как при разборе в два прохода
+        """
+        tok = None
+        tokens = iter(tokens)
         try:
-            while True:
-                tok = next(tokens)
-                if tok.value == 'ЭТО':
-                    tok = next(tokens)
-                    if tok.type == 'WORD' or tok.type == 'SYMBOL':
-                        self._add_tag(tok.value)
-                    else:
-                        raise CorrectorSyntaxError('Ожидалось имя процедуры', tok.line, tok.start, tok.end)
-        except StopIteration:
+            for tok in tokens:
+                self.handle(tok)
+        except CorrectorSyntaxError as e:
+            self._check_fixups(e.args[1:3] or None, tokens)
+            raise
+        return tok
+
+    def _check_fixups(self, before: tuple = None, rest=()):
+        """Ошибка для первого вызова неопределённой процедуры. before -- (строка, столбец) синтаксической
+        ошибки: тогда проверяются только вызовы до неё, а определения ищутся ещё и в оставшихся токенах rest
+        """
+        defined = set()
+        previous = None
+        for tok in rest:
+            if previous is not None and previous.value == 'ЭТО' and tok.type in ('WORD', 'SYMBOL'):
+                defined.add(tok.value)
+            previous = tok
+        for name, tok in self.fixups.items():
+            if name not in defined and (before is None or (tok.line, tok.start) < before):
+                raise CorrectorSyntaxError(f'Не определена процедура с именем {name}', tok.line, tok.start, tok.end)
+
+    def _renumber(self):
+        """Нумерует теги как раньше, при разборе в два прохода: процедуры подряд в порядке определения,
+        за ними блоки в порядке появления
+        """
+        order = list(self.definitions.values())
+        procedures = set(order)
+        order.extend(tag_id for tag_id in range(len(self.tags)) if tag_id not in procedures)
+        if order == list(range(len(order))):
             return
 
-    def compile(self, code: str) -> bytearray:
-        self.startup(code)
+        mapping = [0] * len(order)
+        for new, old in enumerate(order):
+            mapping[old] = new
+        tags = [None] * len(order)
+        for old in order:
+            tags[mapping[old]] = bc.remap_tags(self.tags[old], mapping)
+            self.tags[old] = None  # Старая копия не нужна: в памяти не больше одной лишней
+        self.tags = tags
+        self.procedures = {name: mapping[tag_id] for name, tag_id in self.definitions.items()}
+
+    def _compile_incremental(self, code: str) -> bytearray:
+        """Компилирует заново только процедуры, текст которых изменился с прошлого вызова"""
+        self.reset()
 
-        last_tok = None
-        for tok in self.parser.parse(code):
-            self.handle(tok)
-            last_tok = tok
+        chunks = []
+        for text, line, column in split_procedures(code):
+            entry = self.units.get(text)
+            tokens = None
+            if entry is None:
+                tokens = list(self.parser.parse(text, line, column))
+                if not tokens:  # Пробелы и комментарии
+                    continue
+                name = None
+                if len(tokens) > 1 and tokens[0].value == 'ЭТО' and tokens[1].type in ('WORD', 'SYMBOL'):
+                    name = tokens[1].value
+            else:
+                name = entry[0].name
+
+            if name is not None:
+                if name in self.procedures:
+                    return self._compile_full(code)  # Ошибку с её положением в тексте найдёт полная компиляция
+                self._add_tag(name)
+            chunks.append((text, line, column, entry, tokens))
+
+        units = {}
+        for text, line, column, entry, tokens in chunks:
+            if entry is not None and all(name in self.procedures for name in entry[0].externals):
+                entry = self._link_unit(*entry)
+            else:
+                if tokens is None:  # Изменился набор процедур, на которые ссылается неизменённая процедура
+                    tokens = list(self.parser.parse(text, line, column))
+                entry = self._compile_unit(tokens)
+            units[text] = entry
+        self.units = units
 
+        return self.compose()
+
+    def _compile_unit(self, tokens) -> tuple[Unit, tuple, tuple]:
+        """Компилирует процедуру в общий список тегов и возвращает её в местной нумерации тегов"""
+        base = len(self.tags)
+        self._handle_all(tokens)
+        self._check_fixups()
         if self.stack:
-            raise CorrectorSyntaxError('Незавершённый блок!', last_tok.line, last_tok.start, last_tok.end)
+            raise CorrectorSyntaxError('Незавершённый блок!', tokens[-1].line, tokens[-1].start, tokens[-1].end)
+
+        name = tokens[1].value
+        own = self.procedures[name]
+        self._optimize((own, *range(base, len(self.tags))))
+        names = list(self.procedures)  # Номер тега процедуры -> имя
+        linked = (self.tags[own], *self.tags[base:])
+
+        local = {own: 0}
+        local.update((base + i - 1, i) for i in range(1, len(linked)))
+        externals = []
+        for code in linked:
+            for ref in bc.tag_refs(code):
+                if ref not in local:
+                    local[ref] = len(linked) + len(externals)
+                    externals.append(names[ref])
+
+        unit = Unit(name, tuple(bytes(bc.remap_tags(code, local)) for code in linked), tuple(externals))
+        return unit, (own, *range(base, base + len(linked) - 1), *(self.procedures[n] for n in externals)), linked
+
+    def _link_unit(self, unit: Unit, mapping: tuple, linked: tuple) -> tuple[Unit, tuple, tuple]:
+        """Переводит процедуру из местной нумерации тегов в общую"""
+        base = len(self.tags)
+        if base + len(unit.tags) - 1 > 16**4:
+            raise CorrectorMemoryError('Слишком большое число конструкций')
 
-        return self.compose()
+        own = self.procedures[unit.name]
+        new_mapping = (own, *range(base, base + len(unit.tags) - 1), *(self.procedures[n] for n in unit.externals))
+        if new_mapping != mapping:  # Процедура сдвинулась -- номера тегов нужно пересчитать
+            linked = tuple(bc.remap_tags(code, new_mapping) for code in unit.tags)
+
+        self.tags[own] = linked[0]
+        self.tags.extend(linked[1:])
+        return unit, new_mapping, linked
+
+    def _optimize(self, tag_ids):
+        """Проход оптимизатора между разбором (handle) и сборкой (compose)"""
+        if self.optimize:
+            optimizer.optimize(self.tags, tag_ids, self.inline_size)
+
+    def link(self, command: str) -> tuple[bytearray, bytearray, dict]:
+        """Программа только из тегов, достижимых из команды command (по последней скомпилированной программе).
+
+        Возвращает байт-код программы, байт-код команды и имена оставшихся процедур с новыми номерами тегов.
+        """
+        command_bytecode = self.compile_one_command(command)
+        tags, mapping = linker.link(self.tags, bc.tag_refs(command_bytecode))
+
+        bytecode = bytearray()
+        for tag_id, tag_bytecode in enumerate(tags):
+            bytecode.extend((bc.TAG, *add_number(tag_id)))
+            bytecode.extend(tag_bytecode)
+        procedures = {name: mapping[tag_id] for name, tag_id in self.procedures.items() if tag_id in mapping}
+        return bytecode, bc.remap_tags(command_bytecode, mapping), procedures
 
     def compile_one_command(self, code: str) -> bytearray:
         tokens = self.parser.parse(code)
@@ -82,7 +272,7 @@ class Compiler:
                 else:
                     bytecode.extend(self.commands[tok.value])
             elif tok.type == "WORD" or tok.type == "SYMBOL":
-                if tok.value in self.procedures.keys():
+                if tok.value in self.procedures:
                     bytecode.extend((bc.LOAD_TAG, *add_number(self.procedures[tok.value]), bc.POP_JUMP))
                 else:
                     raise CorrectorSyntaxError(f'Не определена процедура с именем {tok.value}')
@@ -98,47 +288,63 @@ class Compiler:
     def handle(self, tok):
         if not self.stack:
             if tok.type == 'KEYWORD' and tok.value == 'ЭТО':
+                self.interned = {}  # Блоки сливаются только внутри процедуры, как при раздельной компиляции
                 self.stack.append(stack_elements.Procedure('', -1))
             else:
                 raise CorrectorSyntaxError('На внешнем уровне программы не должно быть команд', tok.line, tok.start, tok.end)
         else:
-            match self.stack[-1]:
-                case stack_elements.Procedure:
-                    self.handle_procedure(tok, self.stack[-1])
-                case stack_elements.WriteCommand:
-                    self.handle_symbol(tok, self.stack[-1])
-                case stack_elements.If:
-                    self.handle_if(tok, self.stack[-1])
-                case stack_elements.ForLoop:
-                    self.handle_for(tok, self.stack[-1])
-                case stack_elements.WhileLoop:
-                    self.handle_while(tok, self.stack[-1])
-                case stack_elements.CodeBlock:
-                    self.handle_code_block(tok, self.stack[-1])
+            state = self.stack[-1]
+            self.handlers[type(state)](tok, state)
 
     def _add_tag(self, name: str = None) -> int:
         tag_id = len(self.tags)
         if tag_id >= 16**4:  # Два байта
             raise CorrectorMemoryError('Слишком большое число конструкций')
-        if name:
+        if name is not None:  # Имя-символ ПУСТО -- 0
             self.procedures[name] = tag_id
         self.tags.append(bytearray())
 
         return tag_id
 
     def handle_end(self):
-        self.tags[self.stack.pop().tag].append(bc.RETURN)
+        tag = self.stack.pop().tag
+        self.tags[tag].append(bc.RETURN)
+        if self.stack and type(self.stack[-1]) is stack_elements.If:
+            self._intern(tag)
+
+    def _intern(self, tag: int):
+        """Заменяет только что завершённый блок ЕСЛИ таким же блоком, завершённым раньше.
+
+        Ссылка на блок -- последние два байта тега, в котором стоит ЕСЛИ. Тег освобождается, только если он
+        последний (вложенные в него блоки тоже заменены), иначе блок остаётся отдельным.
+        """
+        first = self.interned.setdefault(bytes(self.tags[tag]), tag)
+        if first != tag and tag == len(self.tags) - 1:
+            self.tags.pop()
+            self.tags[self.stack[-1].tag][-2:] = add_number(first)
 
     def handle_procedure(self, tok, state):
         if not state.name:
             if tok.type == 'WORD' or tok.type == 'SYMBOL':
                 state.name = tok.value
-                state.tag = self.procedures[state.name]
+                state.tag = self._define(tok)
             else:
                 raise CorrectorSyntaxError('Ожидалось имя процедуры', tok.line, tok.start, tok.end)
         else:
             self.handle_command(tok, state)
 
+    def _define(self, tok) -> int:
+        """Номер тега определяемой процедуры: уже выданный при вызове или новый"""
+        name = tok.value
+        if name in self.definitions:
+            raise CorrectorSyntaxError(f'Процедура {name} уже определена', tok.line, tok.start, tok.end)
+        tag_id = self.procedures.get(name)
+        if tag_id is None:
+            tag_id = self._add_tag(name)
+        self.fixups.pop(name, None)
+        self.definitions[name] = tag_id
+        return tag_id
+
     def handle_if(self, tok, state):
         if not state.code_block:
             if state.check == -1:
@@ -153,13 +359,11 @@ class Compiler:
         else:
             if tok.value == 'ИНАЧЕ':
                 if not state.else_check:
-                    if_tag = get_number(*self.tags[state.tag][-2:])  # Последняя цифра в байт-коде
+                    code = self.tags[state.tag]
                     else_tag = self._add_tag()
-                    self.tags[state.tag] = self.tags[state.tag][:-3]  # Удаление POP_JUMP_IF <tag>
-
-                    self.tags[state.tag].extend((bc.POP_JUMP_IF_ELSE,
-                                                 *add_number(if_tag),
-                                                 *add_number(else_tag)))  # POP_JUMP_IF_ELSE <if_tag> <else_tag>
+                    # POP_JUMP_IF <if_tag> -> POP_JUMP_IF_ELSE <if_tag> <else_tag>
+                    code[-3] = bc.POP_JUMP_IF_ELSE
+                    code.extend(add_number(else_tag))
 
                     self.stack.append(stack_elements.CodeBlock(False, False, else_tag))
                     state.else_check = True
@@ -181,32 +385,35 @@ class Compiler:
                     self.tags[state.tag].append(bc.BOOL_NOT)
                 self.tags[state.tag].extend((bc.POP_JUMP_IF, *add_number(len(self.tags))))
                 state.code_block = True
-                self.stack.append(stack_elements.CodeBlock(False, False, self._add_tag()))
+                state.body = self._add_tag()
+                self.stack.append(stack_elements.CodeBlock(False, False, state.body))
                 self.handle(tok)
         else:
-            self.tags[-1] = self.tags[-1][:-1]  # Удаление RETURN
-            self.tags[-1].extend((bc.LOAD_TAG, *add_number(state.tag), bc.POP_JUMP, bc.RETURN))
+            # Тело заканчивается переходом на проверку условия. Переход стоит перед RETURN, поэтому
+            # виртуальная машина выполняет его без записи адреса возврата, и цикл не растит стек вызовов
+            self.tags[state.body][-1:] = (bc.LOAD_TAG, *add_number(state.tag), bc.POP_JUMP, bc.RETURN)  # Вместо RETURN
             self.handle_end()
             self.handle(tok)
 
     def handle_for(self, tok, state):
         if state.iterations == -1:
             if tok.type == 'SYMBOL':
-                if 0 < tok.value < 10:
+                if 0 < tok.value <= 10:  # Цифры 0-9
                     state.iterations = tok.value - 1
                 else:
                     raise CorrectorSyntaxError('Ожидалось кол-во повторений', tok.line, tok.start, tok.end)
             elif tok.type == 'NUMBER':
+                if tok.value >= 16**4:  # Два байта
+                    raise CorrectorSyntaxError('Слишком большое кол-во повторений', tok.line, tok.start, tok.end)
                 state.iterations = tok.value
             else:
                 raise CorrectorSyntaxError('Ожидалось кол-во повторений', tok.line, tok.start, tok.end)
 
-            tag = self._add_tag()
-            self.tags[state.tag].extend((bc.LOAD_TAG, *add_number(tag), bc.POP_JUMP))
-            self.stack.append(stack_elements.CodeBlock(False, False, tag))
+            state.body = self._add_tag()
+            self.tags[state.tag].extend((bc.REPEAT, *add_number(state.iterations), *add_number(state.body)))
+            self.stack.append(stack_elements.CodeBlock(False, False, state.body))
         else:
-            self.tags[-1] = self.tags[-1][:-1] * state.iterations  # Удаление RETURN и "умножение" байт-кода
-            self.tags[-1].append(bc.RETURN)  # и добавление RETURN в конец
+            self.tags[state.body][-1:] = (bc.LOOP_NEXT, *add_number(state.body), bc.RETURN)  # Вместо RETURN
             self.stack.pop()
             self.handle(tok)
 
@@ -214,7 +421,7 @@ class Compiler:
         if tok.type == 'KEYWORD':
             match tok.value:
                 case 'КОНЕЦ':
-                    if state == stack_elements.Procedure:
+                    if type(state) is stack_elements.Procedure:
                         self.handle_end()
                     else:
                         raise CorrectorSyntaxError('Неожиданное ключевое слово КОНЕЦ', tok.line, tok.start, tok.end)
@@ -232,10 +439,10 @@ class Compiler:
             else:
                 self.tags[state.tag].extend(self.commands[tok.value])
         elif tok.type == "WORD" or tok.type == "SYMBOL":
-            if tok.value in self.procedures.keys():
-                self.handle_procedure_call(tok.value)
-            else:
-                raise CorrectorSyntaxError(f'Не определена процедура с именем {tok.value}', tok.line, tok.start, tok.end)
+            if tok.value not in self.procedures:  # Определение может быть дальше
+                self._add_tag(tok.value)
+                self.fixups[tok.value] = tok
+            self.handle_procedure_call(tok.value)
 
     def handle_code_block(self, tok, state):
         if not state.started:
@@ -0,0 +1,45 @@
+"""Сборка программы только из тегов, достижимых из точки входа"""
+from .. import bytecode as bc
+
+
+def reachable(tags: list, roots) -> list[int]:
+    """Номера тегов, достижимых из roots по ссылкам в байт-коде (по возрастанию)"""
+    seen = set(roots)
+    pending = list(seen)
+    while pending:
+        for ref in bc.tag_refs(tags[pending.pop()]):
+            if ref not in seen:
+                seen.add(ref)
+                pending.append(ref)
+    return sorted(seen)
+
+
+def link(tags: list, roots) -> tuple[list[bytearray], dict]:
+    """Оставляет теги, достижимые из roots, объединяет одинаковые (dedupe) и нумерует их подряд с 0
+    в прежнем порядке.
+
+    Возвращает новые теги и соответствие старых номеров новым.
+    """
+    kept = reachable(tags, roots)
+    mapping = {tag_id: i for i, tag_id in enumerate(kept)}
+    tags, merged = dedupe([bc.remap_tags(tags[tag_id], mapping) for tag_id in kept])
+    return tags, {tag_id: merged[i] for tag_id, i in mapping.items()}
+
+
+def dedupe(tags: list) -> tuple[list[bytearray], list[int]]:
+    """Объединяет теги с одинаковым байт-кодом: ссылки на копию переходят к первому такому тегу.
+
+    После замены ссылок одинаковыми могут стать и ссылавшиеся на копии теги, поэтому проход повторяется,
+    пока что-то объединяется. Возвращает новые теги и соответствие старых номеров новым (список).
+    """
+    mapping = list(range(len(tags)))
+    while True:
+        first = {}
+        same = [first.setdefault(bytes(code), tag_id) for tag_id, code in enumerate(tags)]
+        if len(first) == len(tags):
+            return tags, mapping
+        kept = sorted(first.values())
+        dense = {tag_id: i for i, tag_id in enumerate(kept)}
+        renumber = [dense[tag_id] for tag_id in same]
+        tags = [bc.remap_tags(tags[tag_id], renumber) for tag_id in kept]
+        mapping = [renumber[tag_id] for tag_id in mapping]
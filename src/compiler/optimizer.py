@@ -0,0 +1,247 @@
+"""Оптимизатор байт-кода: замена частых последовательностей команд объединёнными"""
+from .. import bytecode as bc
+
+# Шаги, которые сливаются в одну команду: (одиночные команды и их величина, команда с числом, предел числа)
+MOVES = ({bc.RIGHT: 1, bc.LEFT: -1}, bc.MOVE_BY, 0x7FFF)
+# Прибавить к символу больше 73 -- та же ошибка в том же месте, что и 73, поэтому число ограничивается
+ADDS = ({bc.INC_TAPE: 1, bc.DEC_TAPE: -1}, bc.ADD_TAPE, 73)
+
+# Сдвиг в теле цикла ПОКА НЕ <символ> -> команда поиска символа
+SCANS = {bc.RIGHT: bc.SCAN_RIGHT_UNTIL, bc.LEFT: bc.SCAN_LEFT_UNTIL}
+
+INLINE_SIZE = 16  # Наибольшая длина подставляемого тега по умолчанию, байт (без RETURN)
+# Условный переход к тегу -> пропуск подставленного тела (переход, если условие выполнено, -- пропуск, если нет)
+SKIPS = {bc.POP_JUMP_IF: bc.SKIP_IF_NOT, bc.JUMP_IF_TAPE_EQ: bc.SKIP_IF_TAPE_NE, bc.JUMP_IF_TAPE_NE: bc.SKIP_IF_TAPE_EQ}
+
+# (последовательность команд, условие на аргументы, новая команда, её аргументы из аргументов последовательности)
+PATTERNS = (
+    ((bc.LOAD_TAPE, bc.POP_NEXT_PUSH, bc.POP_SET_TAPE), None, bc.INC_TAPE, lambda args: b''),
+    ((bc.LOAD_TAPE, bc.POP_PREV_PUSH, bc.POP_SET_TAPE), None, bc.DEC_TAPE, lambda args: b''),
+    ((bc.LOAD_BOX, bc.LOAD_TAPE, bc.POP_SET_BOX, bc.POP_SET_TAPE), None, bc.SWAP_BOX, lambda args: b''),
+    ((bc.LOAD_SYMBOL, bc.POP_SET_TAPE), None, bc.SET_TAPE_IMM, lambda args: args[0]),
+    ((bc.LOAD_SYMBOL, bc.LOAD_TAPE, bc.BIN_OP), lambda args: args[2][0] == bc.EQUAL,
+     bc.TAPE_EQ_IMM, lambda args: args[0]),
+    ((bc.TAPE_EQ_IMM, bc.POP_JUMP_IF), None, bc.JUMP_IF_TAPE_EQ, lambda args: args[0] + args[1]),
+    ((bc.TAPE_EQ_IMM, bc.BOOL_NOT, bc.POP_JUMP_IF), None, bc.JUMP_IF_TAPE_NE, lambda args: args[0] + args[2]),
+    ((bc.LOAD_TAG, bc.POP_JUMP), None, bc.CALL, lambda args: args[0]),
+)
+
+
+def decode(code) -> list[tuple[int, bytes]]:
+    """Байт-код тега -> список (команда, байты аргументов)"""
+    return [(code[i], bytes(code[i + 1:i + 1 + bc.ARGS_NUM[code[i]]])) for i in bc.instructions(code)]
+
+
+def encode(instructions) -> bytearray:
+    code = bytearray()
+    for op, args in instructions:
+        code.append(op)
+        code.extend(args)
+    return code
+
+
+def optimize(tags: list, tag_ids, inline_size: int = INLINE_SIZE):
+    """Оптимизирует теги tag_ids (на месте). Теги тел циклов нужны уже оптимизированными, а их номера больше
+    номеров содержащих их тегов, поэтому теги обходятся с конца.
+
+    inline_size -- наибольшая длина тега, который подставляется на место перехода к нему (0 -- не подставлять).
+    """
+    for tag_id in sorted(tag_ids, reverse=True):
+        code = peephole(tags[tag_id])
+        folded = fold_loops(code, tags, tag_ids)
+        tags[tag_id] = code if folded is None else peephole(folded)
+    if inline_size:
+        inline(tags, tag_ids, inline_size)
+
+
+def inline(tags: list, tag_ids, size: int):
+    """Подставляет нерекурсивные теги из tag_ids длиной до size байт на место CALL и условных переходов к ним.
+
+    Условный переход к подставленному тегу становится пропуском вперёд (SKIP...). Другие проходы
+    меняют длину команд и сбили бы длины пропусков, поэтому этот проход последний. Теги обходятся в глубину,
+    вызываемые -- раньше вызывающих, так что подставляется уже обработанный код.
+    """
+    tag_ids = set(tag_ids)
+    recursive = set()
+    done = set()
+    path = []  # Теги на пути обхода
+    on_path = {}  # Тег на пути -> оставшиеся ссылки из него
+    for root in sorted(tag_ids):
+        if root in done:
+            continue
+        path.append(root)
+        on_path[root] = iter(set(bc.tag_refs(tags[root])))
+        while path:
+            tag_id = path[-1]
+            for ref in on_path[tag_id]:
+                if ref in on_path:  # Цикл: все теги пути от ref рекурсивны
+                    recursive.update(path[path.index(ref):])
+                elif ref in tag_ids and ref not in done:
+                    path.append(ref)
+                    on_path[ref] = iter(set(bc.tag_refs(tags[ref])))
+                    break
+            else:
+                path.pop()
+                del on_path[tag_id]
+                done.add(tag_id)
+                tags[tag_id] = _inline_tag(tags[tag_id], tags, lambda ref: (
+                    ref in tag_ids and ref not in recursive and len(tags[ref]) - 1 <= size))
+
+
+def _inline_tag(code, tags: list, inlinable) -> bytearray:
+    out = []
+    for op, args in decode(code):
+        if op == bc.CALL and inlinable(get_number(*args)):
+            out.extend(_body(tags, get_number(*args)))
+        elif op in SKIPS and inlinable(get_number(*args[-2:])):
+            body = _body(tags, get_number(*args[-2:]))
+            out.append((SKIPS[op], args[:-2] + bytes(add_number(_size(body)))))
+            out.extend(body)
+        elif op == bc.POP_JUMP_IF_ELSE and inlinable(get_number(*args[:2])) and inlinable(get_number(*args[2:])):
+            then, otherwise = _body(tags, get_number(*args[:2])), _body(tags, get_number(*args[2:]))
+            skip = (bc.SKIP, bytes(add_number(_size(otherwise))))
+            if out and out[-1][0] == bc.TAPE_EQ_IMM:  # Проверка символа на ленте -- без стека
+                out[-1] = (bc.SKIP_IF_TAPE_NE, out[-1][1] + bytes(add_number(_size(then) + _size([skip]))))
+            else:
+                out.append((bc.SKIP_IF_NOT, bytes(add_number(_size(then) + _size([skip])))))
+            out.extend(then)
+            out.append(skip)
+            out.extend(otherwise)
+        else:
+            out.append((op, args))
+    return encode(out)
+
+
+def _body(tags: list, tag_id: int) -> list:
+    """Команды тега без завершающего RETURN"""
+    return decode(tags[tag_id])[:-1]
+
+
+def _size(instructions) -> int:
+    return sum(1 + len(args) for _, args in instructions)
+
+
+def peephole(code) -> bytearray:
+    """Заменяет последовательности из PATTERNS объединёнными командами.
+
+    Переходы внутри тега невозможны, поэтому последовательность можно заменить целиком.
+    """
+    out = []
+    for instruction in decode(code):
+        out.append(instruction)
+        while _reduce(out):
+            pass
+    return encode(out)
+
+
+def fold_loops(code, tags: list, tag_ids) -> bytearray | None:
+    """ПОВТОРИ n с телом из одного сдвига или изменения символа -> одна команда MOVE_BY или ADD_TAPE.
+    Вызов цикла ПОКА НЕ <символ> с телом из одного сдвига -> SCAN_RIGHT_UNTIL или SCAN_LEFT_UNTIL, если теги
+    цикла среди оптимизируемых tag_ids: тело другой процедуры при раздельной компиляции может измениться.
+
+    Возвращает None, если заменять нечего.
+    """
+    out = []
+    changed = False
+    for op, args in decode(code):
+        if op == bc.REPEAT:
+            count, body = get_number(*args[:2]), get_number(*args[2:])
+            body_code = decode(tags[body])
+            if len(body_code) == 3 and body_code[1:] == [(bc.LOOP_NEXT, args[2:]), (bc.RETURN, b'')]:
+                for steps in (MOVES, ADDS):
+                    step = _run_length(body_code[0], steps)
+                    if step is not None and _fits(step * count, steps):
+                        if count:
+                            out.append(_make_run(step * count, steps))
+                        changed = True
+                        break
+                else:
+                    out.append((op, args))
+                continue
+        elif op == bc.CALL:
+            scan = _scan(args, tags, tag_ids)
+            if scan is not None:
+                out.append(scan)
+                changed = True
+                continue
+        out.append((op, args))
+    return encode(out) if changed else None
+
+
+def _scan(args: bytes, tags: list, tag_ids) -> tuple[int, bytes] | None:
+    """Проверка условия цикла ПОКА НЕ <символ>: JUMP_IF_TAPE_NE <символ> <тело> RETURN,
+    тело: RIGHT или LEFT, CALL <проверка условия>, RETURN.
+    """
+    if get_number(*args) not in tag_ids:
+        return None
+    condition = decode(tags[get_number(*args)])
+    if len(condition) != 2 or condition[0][0] != bc.JUMP_IF_TAPE_NE or condition[1][0] != bc.RETURN:
+        return None
+    symbol, body = condition[0][1][:1], condition[0][1][1:]
+    if get_number(*body) not in tag_ids:
+        return None
+    body_code = decode(tags[get_number(*body)])
+    if len(body_code) == 3 and body_code[0][0] in SCANS and body_code[1:] == [(bc.CALL, args), (bc.RETURN, b'')]:
+        return SCANS[body_code[0][0]], symbol
+    return None
+
+
+def _reduce(out: list) -> bool:
+    for ops, condition, op, make_args in PATTERNS:
+        n = len(ops)
+        if len(out) >= n and tuple(instruction[0] for instruction in out[-n:]) == ops:
+            args = [instruction[1] for instruction in out[-n:]]
+            if condition is None or condition(args):
+                out[-n:] = [(op, make_args(args))]
+                return True
+    return _coalesce(out)
+
+
+def _coalesce(out: list) -> bool:
+    """Сливает две последние команды, если обе -- сдвиги ленты или обе -- изменения символа одного знака"""
+    if len(out) < 2:
+        return False
+    for steps in (MOVES, ADDS):
+        first, second = _run_length(out[-2], steps), _run_length(out[-1], steps)
+        if first is None or second is None:
+            continue
+        if steps is ADDS and (first > 0) != (second > 0):  # ПЛЮС МИНУС на символе @ -- ошибка, а не 0
+            return False
+        total = first + second
+        if not _fits(total, steps):
+            return False
+        out[-2:] = [_make_run(total, steps)] if total else []
+        return True
+    return False
+
+
+def _run_length(instruction, steps) -> int | None:
+    single, multi, _ = steps
+    op, args = instruction
+    if op in single:
+        return single[op]
+    if op == multi:
+        number = get_number(*args)
+        return number - 0x10000 if number & 0x8000 else number
+    return None
+
+
+def _fits(total: int, steps) -> bool:
+    return steps is ADDS or abs(total) <= steps[2]
+
+
+def _make_run(total: int, steps) -> tuple[int, bytes]:
+    single, multi, limit = steps
+    for op, step in single.items():
+        if step == total:
+            return op, b''
+    total = max(-limit, min(limit, total))
+    return multi, bytes(add_number(total & 0xFFFF))
+
+
+def add_number(number: int) -> tuple[int, int]:
+    return number >> 8, number & 0xFF
+
+
+def get_number(byte1: int, byte2: int) -> int:
+    return (byte1 << 8) + byte2
@@ -1,3 +1,4 @@
+import re
 from typing import NamedTuple
 
 class Token(NamedTuple):
@@ -8,6 +9,11 @@ class Token(NamedTuple):
     end: int
 
 
+WORD_RE = re.compile(r'\S+')
+# Комментарии пропускаются, чтобы не принять закомментированный КОНЕЦ за конец процедуры
+PROCEDURE_END_RE = re.compile(r'(?<!\S)(?://[^\n]*|КОНЕЦ(?!\S))', re.IGNORECASE)
+
+
 class Parser:
     def __init__(self):
         self.keywords = ['ЭТО', 'ЕСЛИ', 'ПОКА', 'КОНЕЦ', 'ПОВТОРИ', 'ТО', 'НЕ']
@@ -20,52 +26,64 @@ class Parser:
                    ',', '!', '?', ';', ':', '\'', '"', '#', '|', '$', '%', '~', '@']
         self.checks = ['Я=Л', 'Я>Л', 'Я<Л', 'Я#Л', 'ЦИФРА']
 
-        self.line = self.row = 0
-        self.start = 0
-        self.cur_token = ''
-        self.in_comment = False
+        # Слово -> (тип, значение). Порядок заполнения задаёт приоритет: символы, ключевые слова, команды, проверки.
+        self.table = {}
+        for value, word in enumerate(self.symbols):
+            self.table.setdefault(word, ('SYMBOL', value))
+        for kind, words in (('KEYWORD', self.keywords), ('COMMAND', self.commands), ('CHECK', self.checks)):
+            for word in words:
+                self.table.setdefault(word, (kind, word))
+
+        self.line = 0
 
     def reset(self):
-        self.line = self.row = 0
-        self.cur_token = ''
-        self.in_comment = False
+        self.line = 0
 
-    def parse(self, code):
+    def parse(self, code, line: int = 0, column: int = 0):
+        """code -- текст или поток текста (открытый файл, итератор строк или кусков), который читается
+        по мере разбора. Куски склеиваются как есть: строки должны сохранять '\\n' (как у файла или
+        splitlines(keepends=True)), иначе последнее слово строки сольётся с первым словом следующей.
+        line и column -- положение начала code в исходном тексте
+        """
         self.reset()
 
-        for symbol in code.upper():
-            if symbol.isspace():
-                if self.cur_token and not self.in_comment:
-                    yield self._get_tok()
-                    self.cur_token = ''
-                if symbol == '\n':
-                    self.row = 0
-                    self.line += 1
-                    if self.in_comment:
-                        self.cur_token = ''
-                        self.in_comment = False
-            else:
-                if len(self.cur_token) == 0:
-                    self.start = self.row
-                self.cur_token += symbol
-                if self.cur_token == '//':
-                    self.in_comment = True
-            if symbol != '\n':
-                self.row += 1
-        if self.cur_token and not self.in_comment:
-            yield self._get_tok()
-
-    def _get_tok(self) -> Token:
-        if self.cur_token in self.symbols:
-            return Token('SYMBOL', self.symbols.index(self.cur_token), self.line, self.start, self.row)
-        elif self.cur_token in self.keywords:
-            return Token('KEYWORD', self.cur_token, self.line, self.start, self.row)
-        elif self.cur_token in self.commands:
-            return Token('COMMAND', self.cur_token, self.line, self.start, self.row)
-        elif self.cur_token in self.checks:
-            return Token('CHECK', self.cur_token, self.line, self.start, self.row)
-        elif self.cur_token.isdigit():
-            return Token('NUMBER', int(self.cur_token), self.line, self.start, self.row)
-        else:
-            return Token('WORD', self.cur_token, self.line, self.start, self.row)
+        table = self.table
+        for self.line, text in enumerate(code.split('\n') if isinstance(code, str) else lines(code), line):
+            for match in WORD_RE.finditer(text):
+                word = match.group().upper()
+                if word.startswith('//'):  # Комментарий до конца строки
+                    break
+
+                kind = table.get(word)
+                if kind is None:
+                    kind = ('NUMBER', int(word)) if word.isdigit() else ('WORD', word)
+                yield Token(kind[0], kind[1], self.line, match.start() + column, match.end() + column)
+            column = 0
+
+
+def lines(chunks):
+    """Строки текста из потока кусков: куски не обязаны заканчиваться на границе строки, границы строк --
+    только '\\n' внутри кусков
+    """
+    tail = ''
+    for chunk in chunks:
+        *complete, tail = (tail + chunk).split('\n')
+        yield from complete
+    yield tail
+
+
+def split_procedures(code: str):
+    """Делит текст программы на куски, каждый из которых заканчивается словом КОНЕЦ.
 
+    Возвращает тройки (текст, строка, столбец начала куска). Последний кусок -- остаток после последнего КОНЕЦ.
+    """
+    start = line = column = 0
+    for match in PROCEDURE_END_RE.finditer(code):
+        if match.group().startswith('//'):
+            continue
+        end = match.end()
+        yield code[start:end], line, column
+        line += code.count('\n', start, end)
+        column = end - code.rfind('\n', 0, end) - 1
+        start = end
+    yield code[start:], line, column
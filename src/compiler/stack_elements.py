@@ -1,16 +1,15 @@
 from dataclasses import dataclass
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class StackElem:
-    def __eq__(self, other):
-        return isinstance(self, other)
+    pass
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Procedure(StackElem):
     name: str
     tag: int
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class If(StackElem):
     no: bool
     symbol_check: bool
@@ -19,24 +18,26 @@ class If(StackElem):
     code_block: bool
     else_check: bool
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class ForLoop(StackElem):
     tag: int
     iterations: int
+    body: int = -1
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class WhileLoop(StackElem):
     no: bool
     symbol_check: bool
     check: int
     tag: int
     code_block: bool
+    body: int = -1
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class WriteCommand(StackElem):
     tag: int
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class CodeBlock(StackElem):
     started: bool
     multiline: bool
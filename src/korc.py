@@ -0,0 +1,115 @@
+"""
+Скомпилированная программа в файле .korc (все числа -- little-endian):
+
+    заголовок      HEADER: b'KORC', версия формата, размер слова программы (4),
+                   число процедур, число тегов, длина байт-кода, длина загруженной программы (в словах)
+    процедуры      для каждой: номер тега (2 байта), вид имени (1 байт): 0 -- слово, тогда длина имени
+                   (2 байта) и имя в UTF-8, 1 -- символ, тогда его код (2 байта)
+    теги           для каждого: номер тега (2 байта), адрес в загруженной программе (4 байта)
+    байт-код       как его вернул Compiler.compile
+    выравнивание   нули до границы 4 байт
+    программа      загруженная программа Vm.load: слова по 4 байта со знаком
+
+Загрузка не разбирает байт-код: программа копируется в array одним куском из mmap файла.
+VERSION увеличивается при любом изменении кодов команд или загрузки в Vm.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import NamedTuple
+
+from .compiler import Compiler
+from .vm import Vm
+
+MAGIC = b'KORC'
+VERSION = 3
+HEADER = struct.Struct('<4sHHIIII')
+PROCEDURE = struct.Struct('<HBH')
+WORD, SYMBOL = 0, 1  # Вид имени процедуры
+TAG = struct.Struct('<HI')
+
+
+class Compiled(NamedTuple):
+    procedures: dict  # Имя -> номер тега, как Compiler.procedures
+    tags: dict  # Номер тега -> адрес в program
+    program: array  # Загруженная программа (Vm.load)
+    bytecode: bytes
+
+
+def save(path, bytecode: bytearray, procedures: dict):
+    """Записывает программу: bytecode -- результат Compiler.compile, procedures -- Compiler.procedures"""
+    program, tags = Vm().load(bytecode)
+    if sys.byteorder != 'little':
+        program.byteswap()
+
+    parts = [HEADER.pack(MAGIC, VERSION, program.itemsize, len(procedures), len(tags), len(bytecode), len(program))]
+    for name, tag_id in procedures.items():
+        if isinstance(name, int):  # Процедура названа символом
+            parts.append(PROCEDURE.pack(tag_id, SYMBOL, name))
+            continue
+        encoded = name.encode('utf-8')
+        parts.append(PROCEDURE.pack(tag_id, WORD, len(encoded)))
+        parts.append(encoded)
+    for tag_id, address in tags.items():
+        parts.append(TAG.pack(tag_id, address))
+    parts.append(bytes(bytecode))
+    size = sum(map(len, parts))
+    parts.append(bytes(-size % program.itemsize))
+    parts.append(program.tobytes())
+
+    with open(path, 'wb') as f:
+        f.write(b''.join(parts))
+
+
+def load(path) -> Compiled:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < HEADER.size:
+            raise ValueError('Файл слишком короткий для .korc')
+        magic, version, itemsize, procedures_num, tags_num, bytecode_size, program_size = HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise ValueError('Не файл .korc')
+        if version != VERSION or itemsize != array('i').itemsize:
+            raise ValueError(f'Неподдерживаемая версия .korc: {version}')
+
+        try:
+            offset = HEADER.size
+            procedures = {}
+            for _ in range(procedures_num):
+                tag_id, kind, size = PROCEDURE.unpack_from(mm, offset)
+                offset += PROCEDURE.size
+                if kind == SYMBOL:
+                    procedures[size] = tag_id
+                    continue
+                procedures[mm[offset:offset + size].decode('utf-8')] = tag_id
+                offset += size
+            tags = dict(TAG.iter_unpack(mm[offset:offset + TAG.size * tags_num]))
+        except struct.error:
+            raise ValueError('Файл .korc обрезан') from None
+        offset += TAG.size * tags_num
+        bytecode = mm[offset:offset + bytecode_size]
+        offset += bytecode_size
+        offset += -offset % itemsize
+        if len(mm) < offset + program_size * itemsize:
+            raise ValueError('Файл .korc обрезан')
+
+        program = array('i')
+        with memoryview(mm) as view:
+            program.frombytes(view[offset:offset + program_size * itemsize])
+        if sys.byteorder != 'little':
+            program.byteswap()
+    return Compiled(procedures, tags, program, bytecode)
+
+
+def compile_command(compiled: Compiled, command: str) -> bytearray:
+    """Compiler.compile_one_command для программы из файла: нужны только имена процедур"""
+    compiler = Compiler(cache_size=0)
+    compiler.procedures = dict(compiled.procedures)
+    return compiler.compile_one_command(command)
+
+
+def startup(vm: Vm, compiled: Compiled, command: bytearray):
+    """Vm.startup без загрузки байт-кода"""
+    if vm.source is not compiled.bytecode:
+        vm.use(compiled.program, compiled.tags, compiled.bytecode)
+    vm.startup(compiled.bytecode, command)
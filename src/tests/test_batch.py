@@ -0,0 +1,30 @@
+from ..batch import grade, main
+
+PROGRAMS = {
+    'восклицание': 'ЭТО Тест ПОКА НЕ ПУСТО ВПРАВО ПИШИ ! КОНЕЦ',
+    'минус': 'ЭТО Тест МИНУС КОНЕЦ',
+    'вечно': 'ЭТО Тест ПОКА ПУСТО ВПРАВО КОНЕЦ',
+    'ошибка': 'ЭТО Тест Прыжок КОНЕЦ',
+}
+TAPES = ['ПРИВЕТ МИР', '5', '']
+
+
+def test_grade():
+    results = list(grade(PROGRAMS, TAPES, 'Тест', steps=1000, workers=1))
+
+    assert [r['status'] for r in results] == ['error'] + ['finished'] * 5 + ['error', 'finished', 'finished', 'budget']
+    assert results[0]['program'] == 'ошибка' and results[1]['tape'] == 'ПРИВЕТ!МИР'
+    assert results[5]['tape'] == '4' and results[6]['error'] == 'Не могу!'
+    assert list(grade(PROGRAMS, TAPES, 'Тест', steps=1000, workers=2)) == results
+
+
+def test_main(tmp_path, capsys):
+    program, tapes, bad = tmp_path / 'program.kor', tmp_path / 'tapes.txt', tmp_path / 'bad.korc'
+    program.write_text(PROGRAMS['восклицание'], encoding='utf-8')
+    tapes.write_text('ПРИВЕТ МИР\n5\n', encoding='utf-8')
+    bad.write_bytes(b'KORC' + bytes(30))
+
+    assert main([str(program), '--command', 'Тест', '--tapes', str(tapes), '-j', '1']) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert main([str(program), str(bad), '--command', 'Тест', '--tapes', str(tapes)]) == 1
+    assert capsys.readouterr().err.startswith(str(bad))
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from .. import cli
+
+
+def test_cli(tmp_path, capsys):
+    program = tmp_path / 'program.kor'
+    program.write_text('ЭТО Восклицание ПОКА НЕ ПУСТО ВПРАВО ПИШИ ! КОНЕЦ', encoding='utf-8')
+
+    assert cli.main([str(program), '--command', 'Восклицание', '--tape', 'ПРИВЕТ МИР']) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[:3] == ['|ПРИВЕТ!МИР|', '       ^', 'Положение: 6']
+    # В отдельном процессе: другие тесты могут импортировать Qt сами
+    check = (f'import sys; from src import cli; cli.main([{str(program)!r}, "--command", "Восклицание"]); '
+             f'assert "PySide6" not in sys.modules')
+    subprocess.run([sys.executable, '-c', check], cwd=Path(__file__).parents[2], check=True, capture_output=True)
+
+    assert cli.main([str(program), '--command', 'Прыжок']) == 1
+    assert 'Прыжок'.upper() in capsys.readouterr().err
@@ -1,5 +1,7 @@
 from ..compiler import Compiler
 from ..bytecode import *
+from ..errors import CorrectorSyntaxError
+from ..vm import Vm
 
 c = Compiler()
 
@@ -79,3 +81,148 @@ def test_compile_one_command():
     bc = c.compile_one_command(command)
 
     assert bc == bytearray((RIGHT,))
+
+def test_compile_cache():
+    compiler = Compiler(cache_size=1)
+    first = 'ЭТО Первая ВПРАВО КОНЕЦ'
+    second = 'ЭТО Вторая ВЛЕВО КОНЕЦ'
+
+    bc1 = compiler.compile(first)
+    assert compiler.compile(first) is bc1
+    compiler.compile(second)
+    compiler.compile(first)  # Вытеснена второй программой
+
+    info = compiler.cache.info()
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 1)
+    assert compiler.procedures == {'ПЕРВАЯ': 0}
+
+def test_incremental():
+    code = ('ЭТО Программа ЕСЛИ ПУСТО ТО ВПРАВО Процедура КОНЕЦ\n'
+            'ЭТО Процедура ПОКА Я=Л ПЛЮС КОНЕЦ\n'
+            'ЭТО Последняя ЕСЛИ ПУСТО ТО ВЛЕВО ИНАЧЕ Программа КОНЕЦ')
+    edited = code.replace('ПОКА Я=Л ПЛЮС', 'ЕСЛИ Я>Л ТО { МИНУС ВЛЕВО } ПЛЮС')
+    compiler = Compiler(cache_size=0, incremental=True)
+
+    assert compiler.compile(code) == Compiler().compile(code)
+    units = dict(compiler.units)
+
+    assert compiler.compile(edited) == Compiler().compile(edited)
+    unchanged = [text for text in compiler.units if text in units]
+    assert len(unchanged) == 2
+    assert all(compiler.units[text][0] is units[text][0] for text in unchanged)
+
+def test_incremental_undefined_procedure():
+    compiler = Compiler(cache_size=0, incremental=True)
+    compiler.compile('ЭТО А Б КОНЕЦ ЭТО Б ВПРАВО КОНЕЦ')
+
+    try:
+        compiler.compile('ЭТО А Б КОНЕЦ ЭТО В ВПРАВО КОНЕЦ')
+    except CorrectorSyntaxError as e:
+        assert e.args[1:] == (0, 6, 7)
+    else:
+        assert False
+
+def test_while_nested_block():
+    code = 'ЭТО Процедура ПОКА НЕ ПУСТО ЕСЛИ А ТО ПЛЮС ВПРАВО КОНЕЦ'
+    bc = c.compile(code)
+
+    assert bc == bytearray((TAG, 0x00, 0x00, LOAD_TAG, 0x00, 0x01, POP_JUMP, RIGHT, RETURN,
+                            TAG, 0x00, 0x01, LOAD_SYMBOL, 0x00, LOAD_TAPE, BIN_OP, EQUAL, BOOL_NOT,
+                            POP_JUMP_IF, 0x00, 0x02, RETURN,
+                            TAG, 0x00, 0x02, LOAD_SYMBOL, 0x0B, LOAD_TAPE, BIN_OP, EQUAL, POP_JUMP_IF, 0x00, 0x03,
+                            LOAD_TAG, 0x00, 0x01, POP_JUMP, RETURN,
+                            TAG, 0x00, 0x03, LOAD_TAPE, POP_NEXT_PUSH, POP_SET_TAPE, RETURN))
+
+def test_for():
+    code = 'ЭТО Процедура ПОВТОРИ 1000 ВПРАВО КОНЕЦ'
+    bc = c.compile(code)
+
+    assert bc == bytearray((TAG, 0x00, 0x00, REPEAT, 0x03, 0xE8, 0x00, 0x01, RETURN,
+                            TAG, 0x00, 0x01, RIGHT, LOOP_NEXT, 0x00, 0x01, RETURN))
+
+
+def test_link():
+    compiler = Compiler()
+    compiler.compile('ЭТО Лишняя ВПРАВО КОНЕЦ ЭТО Шаг ЕСЛИ ПУСТО ТО ПИШИ А КОНЕЦ ЭТО Тест ПОВТОРИ 3 { Шаг ВПРАВО } КОНЕЦ '
+                     'ЭТО Другая Лишняя КОНЕЦ')
+    bytecode, command, procedures = compiler.link('Тест')
+
+    assert procedures == {'ШАГ': 0, 'ТЕСТ': 1}
+    assert command == bytearray((LOAD_TAG, 0x00, 0x01, POP_JUMP))
+    assert [bytecode[i + 1:i + 3] for i in instructions(bytecode) if bytecode[i] == TAG] == \
+        [bytes((0, n)) for n in range(4)]
+
+    vm = Vm()
+    vm.run(bytecode, command)
+    assert [vm.tape.get_at(p) for p in range(4)] == [0x0B, 0x0B, 0x0B, 0]
+
+def test_dedupe():
+    code = ('ЭТО Процедура ЕСЛИ ПУСТО ТО { ПЛЮС ВЛЕВО } ЕСЛИ А ТО ВПРАВО ИНАЧЕ { ПЛЮС ВЛЕВО } '
+            'ЕСЛИ Б ТО ЕСЛИ В ТО ВПРАВО ВЛЕВО ЕСЛИ Б ТО ЕСЛИ В ТО ВПРАВО КОНЕЦ')
+    compiler = Compiler()
+    compiler.compile(code)
+
+    assert len(compiler.tags) == 4
+    assert list(tag_refs(compiler.tags[0])) == [1, 2, 1, 3, 3]
+
+    generated = 'ЭТО Процедура ' + 'ЕСЛИ ПУСТО ТО ВПРАВО ' * 70000 + 'КОНЕЦ'  # Больше, чем номеров тегов
+    assert len(compiler.compile(generated)) < 70000 * 10
+
+    code = 'ЭТО Раз ЕСЛИ А ТО ВПРАВО ИНАЧЕ { ПЛЮС } КОНЕЦ ЭТО Два ЕСЛИ Б ТО ВЛЕВО ИНАЧЕ { ПЛЮС } КОНЕЦ'
+    assert Compiler(cache_size=0, incremental=True).compile(code) == compiler.compile(code)  # Только внутри процедуры
+
+def test_link_dedupe():
+    compiler = Compiler()
+    compiler.compile('ЭТО Раз ЕСЛИ А ТО ВПРАВО КОНЕЦ ЭТО Два ЕСЛИ А ТО ВПРАВО КОНЕЦ ЭТО Тест Раз Два КОНЕЦ')
+    bytecode, command, procedures = compiler.link('Тест')
+
+    assert procedures == {'РАЗ': 0, 'ДВА': 0, 'ТЕСТ': 1}
+    assert [bytecode[i] for i in instructions(bytecode)].count(TAG) == 3
+
+def test_stream():
+    code = ('ЭТО Тест ЕСЛИ ПУСТО ТО Шаг ИНАЧЕ { Другая ВПРАВО } КОНЕЦ  // вызовы до определения\n'
+            'ЭТО Шаг ПОВТОРИ 3 ПЛЮС КОНЕЦ\n'
+            'ЭТО Другая ПОКА НЕ ПУСТО Шаг КОНЕЦ')
+    chunks = (code[i:i + 7] for i in range(0, len(code), 7))  # Куски рвут слова и строки
+    compiler = Compiler()
+
+    assert compiler.compile(chunks) == Compiler().compile(code)
+    assert compiler.procedures == {'ТЕСТ': 0, 'ШАГ': 1, 'ДРУГАЯ': 2}
+    assert compiler.cache.info().currsize == 0
+
+    code = 'ЭТО Шаг ВПРАВО\nКОНЕЦ'
+    assert Compiler().compile(iter(code.splitlines(keepends=True))) == Compiler().compile(code)
+    try:
+        Compiler().compile(iter(code.splitlines()))  # Без '\n' строки склеиваются
+    except CorrectorSyntaxError as e:
+        assert e.args[0] == 'Не определена процедура с именем ВПРАВОКОНЕЦ'
+    else:
+        assert False
+
+def test_stream_errors():
+    for code, error in (('ЭТО Раз Два КОНЕЦ\nЭТО Три Два КОНЕЦ', ('Не определена процедура с именем ДВА', 0, 8, 11)),
+                        ('ЭТО Раз Два КОНЕЦ ЭТО Два КОНЕЦ ЭТО Раз КОНЕЦ', ('Процедура РАЗ уже определена', 0, 36, 39))):
+        try:
+            Compiler().compile(iter(code.splitlines(keepends=True)))
+        except CorrectorSyntaxError as e:
+            assert e.args == error
+        else:
+            assert False
+
+def test_first_error():
+    code = ('ЭТО Раз ВПРАВО П0 КОНЕЦ\n'
+            'ЭТО Два ЕСЛИ А ТО ВПРАВО ИНАЧЕ ВЛЕВО ИНАЧЕ ВЛЕВО КОНЕЦ\n'
+            'ЭТО Три Раз ПУСТО КОНЕЦ')
+    for text, error in ((code, ('Не определена процедура с именем П0', 0, 15, 17)),  # Раньше двух ИНАЧЕ
+                        (code.replace('П0', 'Два'), ('Недопустимые два блока ИНАЧЕ', 1, 37, 42)),
+                        (code.replace('П0', 'Три').replace('ИНАЧЕ ВЛЕВО К', 'К'),
+                         ('Не определена процедура с именем 0', 2, 12, 17))):
+        for compiler, source in ((Compiler(cache_size=0), text),
+                                 (Compiler(cache_size=0), iter(text.splitlines(keepends=True))),
+                                 (Compiler(cache_size=0, incremental=True), text)):
+            try:
+                compiler.compile(source)
+            except CorrectorSyntaxError as e:
+                assert e.args == error
+            else:
+                assert False
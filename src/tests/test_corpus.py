@@ -0,0 +1,21 @@
+from ..benchmarks.suite import CORPUS, ENTRY
+from ..compiler import Compiler
+from ..vm import Vm
+
+
+def run(path, optimize):
+    compiler = Compiler(optimize=optimize)
+    vm = Vm()
+    vm.run(compiler.compile(path.read_text(encoding='utf-8')), compiler.compile_one_command(ENTRY))
+    return vm.tape.position, [vm.tape.get_at(p) for p in range(-10, 60)]
+
+
+def test_corpus():
+    sorted_digits = [0] * 10 + [1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9, 10, 10] + [0] * 40
+    results = {}
+    for path in CORPUS.glob('*.kor'):
+        results[path.stem] = run(path, False)
+        assert run(path, True) == results[path.stem]
+
+    assert results['bubble'] == (0, sorted_digits)
+    assert results['increment'][1][10:18] == [3, 1, 1, 2, 10, 10, 10, 0]  # 2001999
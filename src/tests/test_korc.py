@@ -0,0 +1,62 @@
+from .. import korc
+from ..benchmarks.suite import CORPUS, ENTRY
+from ..compiler import Compiler
+from ..vm import Vm
+
+
+def test_save_load(tmp_path):
+    compiler = Compiler()
+    bytecode = compiler.compile((CORPUS / 'bubble.kor').read_text(encoding='utf-8'))
+    path = tmp_path / 'bubble.korc'
+    korc.save(path, bytecode, compiler.procedures)
+    compiled = korc.load(path)
+
+    assert compiled.procedures == compiler.procedures and compiled.bytecode == bytecode
+    assert (compiled.program, compiled.tags) == Vm().load(bytecode)
+
+    vm, expected = Vm(), Vm()
+    korc.startup(vm, compiled, korc.compile_command(compiled, ENTRY))
+    vm.execute()
+    expected.run(bytecode, compiler.compile_one_command(ENTRY))
+    assert list(vm.tape.get_preview()) == list(expected.tape.get_preview()) and vm.steps == expected.steps
+
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'bad.korc'
+    path.write_bytes(b'KORC' + bytes(30))
+    try:
+        korc.load(path)
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_symbol_name(tmp_path):
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО А ВПРАВО КОНЕЦ ЭТО Шаг А А КОНЕЦ')
+    path = tmp_path / 'symbol.korc'
+    korc.save(path, bytecode, compiler.procedures)
+    compiled = korc.load(path)
+
+    assert compiled.procedures == compiler.procedures
+    vm = Vm()
+    korc.startup(vm, compiled, korc.compile_command(compiled, 'А'))
+    vm.execute()
+    assert vm.tape.position == 1
+
+
+def test_truncated_file(tmp_path):
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Шаг ВПРАВО КОНЕЦ ЭТО Программа Шаг Шаг КОНЕЦ')
+    path = tmp_path / 'program.korc'
+    korc.save(path, bytecode, compiler.procedures)
+    data = path.read_bytes()
+    for size in (korc.HEADER.size + 3, len(data) - 1):
+        path.write_bytes(data[:size])
+        try:
+            korc.load(path)
+        except ValueError:
+            pass
+        else:
+            assert False
@@ -0,0 +1,133 @@
+from ..compiler import Compiler
+from ..bytecode import *
+from ..errors import CorrectorCannotError
+from ..vm import Vm
+
+o = Compiler(optimize=True)
+
+PROGRAM = '''
+ЭТО Шаг
+    ПЛЮС ВПРАВО ЯЩИК+ ВЛЕВО ОБМЕН МИНУС
+    ЕСЛИ Я=Л ТО ВПРАВО ИНАЧЕ { ВЛЕВО ВПРАВО }
+    ЕСЛИ НЕ 5 ТО ПИШИ 5
+КОНЕЦ
+ЭТО Программа ПОВТОРИ 20 { Шаг ВПРАВО } ПОКА НЕ ПУСТО ВЛЕВО ПОВТОРИ 80 ПЛЮС КОНЕЦ
+'''
+
+
+def run(compiler, code, command):
+    vm = Vm()
+    error = None
+    try:
+        vm.run(compiler.compile(code), compiler.compile_one_command(command))
+    except CorrectorCannotError as e:
+        error = e
+    return vm, error
+
+
+def test_fused_commands():
+    code = 'ЭТО Процедура ПЛЮС МИНУС ОБМЕН ПИШИ А Процедура КОНЕЦ'
+    bc = o.compile(code)
+
+    assert bc == bytearray((TAG, 0x00, 0x00, INC_TAPE, DEC_TAPE, SWAP_BOX, SET_TAPE_IMM, 0x0B,
+                            CALL, 0x00, 0x00, RETURN))
+
+def test_fused_jumps():
+    code = 'ЭТО Процедура ЕСЛИ ПУСТО ТО ВПРАВО ЕСЛИ НЕ ПУСТО ТО ВЛЕВО КОНЕЦ'
+    bc = Compiler(optimize=True, inline_size=0).compile(code)
+
+    assert bc == bytearray((TAG, 0x00, 0x00, JUMP_IF_TAPE_EQ, 0x00, 0x00, 0x01, JUMP_IF_TAPE_NE, 0x00, 0x00, 0x02,
+                            RETURN, TAG, 0x00, 0x01, RIGHT, RETURN, TAG, 0x00, 0x02, LEFT, RETURN))
+
+def test_same_result():
+    vm, error = run(Compiler(), PROGRAM, 'Программа')
+    optimized, optimized_error = run(o, PROGRAM, 'Программа')
+
+    assert error is not None and optimized_error is not None  # ПЛЮС после символа @
+    assert list(vm.tape.get_preview()) == list(optimized.tape.get_preview())
+    assert (vm.box, vm.tape.position) == (optimized.box, optimized.tape.position)
+
+def test_run_length():
+    code = 'ЭТО Процедура ВПРАВО ВПРАВО ВПРАВО ПЛЮС ПЛЮС МИНУС ВЛЕВО ВПРАВО ПОВТОРИ 300 ВЛЕВО КОНЕЦ'
+    bc = o.compile(code)
+
+    assert bc[:15] == bytearray((TAG, 0x00, 0x00, MOVE_BY, 0x00, 0x03, ADD_TAPE, 0x00, 0x02, DEC_TAPE,
+                                 MOVE_BY, 0xFE, 0xD4, RETURN, TAG))  # -300
+
+def test_run_length_error_point():
+    code = 'ЭТО Процедура ВЛЕВО ВЛЕВО ПИШИ ~ ПОВТОРИ 5 ПЛЮС ВПРАВО КОНЕЦ'  # ~ -- предпоследний символ
+    for compiler in (Compiler(), o):
+        vm = Vm()
+        try:
+            vm.run(compiler.compile(code), compiler.compile_one_command('Процедура'))
+        except CorrectorCannotError:
+            pass
+        else:
+            assert False
+        assert (vm.tape.position, vm.tape.get()) == (-2, 72)
+
+
+def test_scan():
+    code = '''
+    ЭТО Заполнить ПОВТОРИ 300 { ПИШИ А ВПРАВО } ПИШИ Б ПОВТОРИ 300 ВЛЕВО КОНЕЦ
+    ЭТО Туда ПОКА НЕ Б ВПРАВО ПОКА НЕ ПУСТО ВПРАВО ПИШИ В КОНЕЦ
+    ЭТО Обратно ПОКА НЕ ПУСТО ВЛЕВО ВПРАВО ПОКА НЕ А ВЛЕВО КОНЕЦ
+    '''
+    assert SCAN_RIGHT_UNTIL in o.compile(code) and SCAN_LEFT_UNTIL in o.compile(code)
+
+    for sparse in (False, True):
+        vms = []
+        for compiler in (Compiler(), o):
+            vm = Vm(sparse=sparse)
+            for command in ('Заполнить', 'Туда', 'Обратно'):
+                vm.run(compiler.compile(code), compiler.compile_one_command(command))
+                vms.append((vm.tape.position, list(vm.tape.get_preview())))
+        assert vms[:3] == vms[3:]
+
+
+def test_long_scan():
+    compiler = Compiler(optimize=True)
+    vm = Vm()
+    vm.tape.move_by(10 ** 6)
+    vm.tape.set(1)
+    vm.tape.move_by(-10 ** 6)
+    vm.tape.set(2)
+    vm.run(compiler.compile('ЭТО Поиск ПОКА НЕ 0 ВПРАВО КОНЕЦ'), compiler.compile_one_command('Поиск'))
+
+    assert vm.tape.position == 10 ** 6 and vm.call_stack == []
+
+
+def test_inline():
+    code = 'ЭТО Процедура ЕСЛИ ПУСТО ТО ВПРАВО ЕСЛИ НЕ ПУСТО ТО ВЛЕВО КОНЕЦ'
+    bc = o.compile(code)
+
+    assert bc[:13] == bytearray((TAG, 0x00, 0x00, SKIP_IF_TAPE_NE, 0x00, 0x00, 0x01, RIGHT,
+                                 SKIP_IF_TAPE_EQ, 0x00, 0x00, 0x01, LEFT))
+
+    code = '''
+    ЭТО Шаг ЕСЛИ Я>Л ТО ПЛЮС ИНАЧЕ { ВПРАВО ВПРАВО } КОНЕЦ
+    ЭТО Рекурсия ЕСЛИ НЕ ПУСТО ТО { ВПРАВО Рекурсия } КОНЕЦ
+    ЭТО Программа
+        ПОВТОРИ 5 { ПИШИ А ВПРАВО } ПОВТОРИ 5 ВЛЕВО Рекурсия Шаг ВЛЕВО Шаг
+        ЕСЛИ А ТО ПИШИ Б ИНАЧЕ ПИШИ В
+    КОНЕЦ
+    '''
+    bc = o.compile(code)
+    assert SKIP in bc and SKIP_IF_NOT in bc and CALL in bc  # Рекурсия не подставляется
+
+    for text in (code, PROGRAM):
+        vm, error = run(Compiler(), text, 'Программа')
+        optimized, optimized_error = run(o, text, 'Программа')
+        assert repr(error) == repr(optimized_error)
+        assert list(vm.tape.get_preview()) == list(optimized.tape.get_preview())
+        assert (vm.box, vm.tape.position) == (optimized.box, optimized.tape.position)
+
+
+def test_scan_edited_callee():
+    code = 'ЭТО Поиск ЕСЛИ НЕ А ТО { ВПРАВО Поиск } КОНЕЦ ЭТО Тест Поиск КОНЕЦ'
+    edited = code.replace('ВПРАВО', 'ВЛЕВО')
+    compiler = Compiler(cache_size=0, incremental=True, optimize=True)
+    compiler.compile(code)
+
+    assert compiler.compile(edited) == Compiler(cache_size=0, optimize=True).compile(edited)
+    assert SCAN_RIGHT_UNTIL not in compiler.tags[compiler.procedures['ТЕСТ']]
@@ -0,0 +1,21 @@
+from ..compiler.parser import Parser, Token
+
+p = Parser()
+
+
+def test_token_types():
+    tokens = list(p.parse('это Процедура ВПРАВО Я=Л ПУСТО 12'))
+
+    assert [(t.type, t.value) for t in tokens] == [('KEYWORD', 'ЭТО'), ('WORD', 'ПРОЦЕДУРА'), ('COMMAND', 'ВПРАВО'),
+                                                   ('CHECK', 'Я=Л'), ('SYMBOL', 0), ('NUMBER', 12)]
+
+def test_positions():
+    tokens = list(p.parse('ЭТО А\n  ВПРАВО КОНЕЦ'))
+
+    assert tokens[1] == Token('SYMBOL', 11, 0, 4, 5)
+    assert tokens[2] == Token('COMMAND', 'ВПРАВО', 1, 2, 8)
+
+def test_comment():
+    tokens = list(p.parse('ВПРАВО // ВЛЕВО\nВЛЕВО //ВПРАВО'))
+
+    assert [t.value for t in tokens] == ['ВПРАВО', 'ВЛЕВО']
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PySide6.QtWidgets')
+from PySide6 import QtCore
+
+from ..ui.app import Window
+
+PROGRAM = 'ЭТО Шаг ПИШИ 5 ПОВТОРИ 1000 { ПЛЮС МИНУС } КОНЕЦ ЭТО Программа ПОВТОРИ 300 { Шаг ВПРАВО } КОНЕЦ'
+
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    references = sys.getrefcount(None)
+    for _ in range(100):
+        app.processEvents()
+    if references - sys.getrefcount(None) >= 100:  # Ссылка на вызов: процесс рано или поздно падает в none_dealloc
+        pytest.skip('Эта сборка PySide6 портит счётчик ссылок None в этой версии Python')
+    return app
+
+
+@pytest.fixture
+def window(app):
+    window = Window()
+    window.error = fail  # Вместо окна с ошибкой
+    yield window
+
+    if window.runner is not None:
+        window.runner.stop()
+        window.thread.wait()
+    window.repaint_timer.stop()
+    window.close()
+    window.deleteLater()
+    app.sendPostedEvents(None, QtCore.QEvent.Type.DeferredDelete)
+    app.processEvents()
+
+
+def fail(e):
+    raise e
+
+
+def run(app, window: Window):
+    window.run_command()
+    while window.thread is not None:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_resume_after_rewind(app, window):
+    window.code_input.setPlainText(PROGRAM)
+    window.commands_input.setText('Программа')
+    run(app, window)
+    assert window.vm.tape.position == 300 and len(window.history) > 2
+
+    window.travel(1)
+    assert 0 < window.vm.tape.position < 300
+    run(app, window)  # Продолжение, а не новый запуск с середины ленты
+    assert window.vm.tape.position == 300
+
+    window.travel(1)
+    window.commands_input.setText('Шаг')
+    run(app, window)  # Команда изменилась -- запуск заново
+    assert window.history.current == len(window.history) - 1 and window.vm.tape.position < 300
+
+
+def test_stop_after_error(window):
+    errors = []
+    window.error = errors.append
+    window.code_input.setPlainText('ЭТО Ошибка МИНУС КОНЕЦ')
+    window.commands_input.setText('Ошибка')
+    window.run_command()
+    window.thread.wait()  # Выполнение закончилось ошибкой до нажатия ■
+    window.stop()
+
+    assert errors == [window.vm.error] and window.thread is None
@@ -1,5 +1,8 @@
-from ..vm import Vm
+from ..vm import Vm, Status, History, Profiler
+from ..vm.vm import Tape, SparseTape
+from ..compiler import Compiler
 from ..bytecode import byte_commands as bc
+from ..errors import CorrectorCannotError
 
 v = Vm()
 
@@ -18,3 +21,216 @@ def test_tags():
     v.run(bytearray((bc.TAG, 0x00, 0x00, bc.LOAD_SYMBOL, 0x01, bc.POP_SET_TAPE, bc.RETURN)), bytearray((bc.LOAD_TAG, 0x00, 0x00, bc.POP_JUMP)))
 
     assert v.tape.get() == 1
+
+def test_load_resolves_tags():
+    vm = Vm()
+    code, tags = vm.load(bytearray((bc.TAG, 0x00, 0x00, bc.LOAD_TAG, 0x00, 0x01, bc.POP_JUMP, bc.LEFT, bc.RETURN,
+                                    bc.TAG, 0x00, 0x01, bc.RIGHT, bc.RETURN)))
+
+    assert tags == {0: 0, 1: 5}
+    assert list(code) == [bc.LOAD_TAG, 5, bc.POP_JUMP, bc.LEFT, bc.RETURN, bc.RIGHT, bc.RETURN]
+
+
+class EndlessTape(Tape):
+    """Пустая лента, на которой в ячейке end записан символ. Запоминает глубину стека вызовов в этот момент"""
+    def __init__(self, vm, end):
+        super().__init__()
+        self.vm = vm
+        self.end = end
+        self.depth = None
+
+    def move_right(self):
+        self.position += 1
+
+    def get(self) -> int:
+        if self.position == self.end:
+            self.depth = len(self.vm.call_stack)
+            return 1
+        return 0
+
+def test_while_constant_call_stack():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Цикл ПОКА ПУСТО ВПРАВО КОНЕЦ')
+
+    depths = []
+    for iterations in (10, 10**5):
+        vm = Vm()
+        vm.tape = EndlessTape(vm, iterations)
+        vm.run(bytecode, compiler.compile_one_command('Цикл'))
+        depths.append(vm.tape.depth)
+
+    assert depths[0] == depths[1] <= 1
+
+def test_tail_call():
+    vm = Vm()
+    code, _ = vm.load(bytearray((bc.TAG, 0x00, 0x00, bc.LOAD_TAG, 0x00, 0x00, bc.POP_JUMP, bc.RETURN)))
+
+    assert code[2] != bc.POP_JUMP  # Загружен как хвостовой переход
+
+def test_nested_repeat():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Процедура ПОВТОРИ 3 ПОВТОРИ 9 { ВПРАВО ПИШИ 1 } ПОВТОРИ 0 ВЛЕВО КОНЕЦ')
+    vm = Vm()
+    vm.run(bytecode, compiler.compile_one_command('Процедура'))
+
+    assert vm.tape.position == 27
+    assert vm.loops == [] and vm.call_stack == []
+
+def test_minus_on_empty():
+    vm = Vm()
+    try:
+        vm.run(bytearray(), bytearray((bc.LOAD_TAPE, bc.POP_PREV_PUSH, bc.POP_SET_TAPE)))
+    except CorrectorCannotError:
+        pass
+    else:
+        assert False
+    assert vm.tape.get() == 0
+
+def test_tape():
+    tape = Tape(size=2)
+    for symbol in range(1, 11):
+        tape.set(symbol)
+        tape.move_left()
+    tape.move_by(5)
+    tape.set(20)
+
+    assert tape.position == -5 and tape.get() == 20
+    assert list(tape.get_preview()) == [0, 10, 9, 8, 7, 20, 5, 4, 3, 2, 1]
+
+    tape.move_by(100)
+    assert tape.get() == 0 and len(tape.data) < 256
+
+
+def test_sparse_tape():
+    tape = SparseTape()
+    tape.move_by(-10 ** 9)
+    for symbol in range(1, 11):
+        tape.set(symbol)
+        tape.move_left()
+    tape.move_by(5)
+    tape.set(0)
+    tape.move_by(10 ** 9)
+    tape.set(0)
+
+    assert tape.get() == 0 and len(tape.pages) <= 2
+    tape.move_by(-10 ** 9)
+    assert list(tape.get_preview()) == [0, 10, 9, 8, 7, 0, 5, 4, 3, 2, 1]
+
+
+def test_sparse_vm():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Процедура ПОВТОРИ 60000 ВПРАВО ПИШИ 1 ВЛЕВО ПИШИ 2 КОНЕЦ')
+    dense, sparse = Vm(), Vm(sparse=True)
+    dense.run(bytecode, compiler.compile_one_command('Процедура'))
+    sparse.run(bytecode, compiler.compile_one_command('Процедура'))
+
+    assert list(sparse.tape.get_preview()) == list(dense.tape.get_preview())
+    assert sparse.tape.position == dense.tape.position == 59999
+
+
+def test_tape_scan():
+    for tape in (Tape(size=2), SparseTape()):
+        for symbol in range(1, 6):
+            tape.set(symbol)
+            tape.move_right()
+        tape.move_by(-5)
+
+        assert tape.scan_right(0) and tape.position == 5
+        assert tape.scan_left(3) and tape.position == 2
+        assert tape.scan_left(0) and tape.position == -1
+        assert not tape.scan_right(7) and tape.position == -1  # Не нашла -- каретка на месте
+        assert not tape.scan_left(7) and tape.position == -1
+        tape.set(7)
+        assert tape.scan_left(7) and tape.get() == 7
+
+    compiler = Compiler(optimize=True)
+    bytecode = compiler.compile('ЭТО Поиск ВПРАВО ПОКА НЕ Б ВПРАВО КОНЕЦ')
+    for vm in (Vm(), Vm(sparse=True)):
+        vm.startup(bytecode, compiler.compile_one_command('Поиск'))
+        assert vm.execute(steps=100) is Status.BUDGET and vm.tape.position == 1
+
+
+def test_execute_budget():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Процедура ПОВТОРИ 1000 ВПРАВО КОНЕЦ ЭТО Вечно ПОКА ПУСТО ВПРАВО ВЛЕВО КОНЕЦ')
+    vm = Vm()
+    vm.startup(bytecode, compiler.compile_one_command('Процедура'))
+
+    assert vm.execute(steps=100) is Status.BUDGET and vm.steps == 100
+    while vm.execute(steps=100) is Status.BUDGET:
+        pass
+    assert vm.tape.position == 1000 and vm.steps == 2004
+
+    vm.startup(bytecode, compiler.compile_one_command('Вечно'))
+    assert vm.execute(seconds=0.01) is Status.BUDGET and vm.steps > 0
+
+    vm.startup(bytecode, bytearray((bc.LOAD_TAPE, bc.POP_PREV_PUSH)))
+    assert vm.execute() is Status.ERROR and isinstance(vm.error, CorrectorCannotError)
+
+
+def test_history():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Процедура ПОВТОРИ 30 { ПИШИ А ПЛЮС ЯЩИК+ ВПРАВО } ПОКА НЕ ПУСТО ВЛЕВО КОНЕЦ')
+    for vm in (Vm(), Vm(sparse=True)):
+        history = History(vm, checkpoint=8)
+        vm.startup(bytecode, compiler.compile_one_command('Процедура'))
+        states = []
+        status = Status.BUDGET
+        while status is Status.BUDGET:
+            history.record()
+            states.append((vm.position, vm.box, vm.tape.position, [vm.tape.get_at(p) for p in range(-5, 40)], vm.loops[:]))
+            status = vm.execute(steps=1)
+        assert status is Status.FINISHED
+
+        for i in (len(states) - 1, 3, 200, 0, 101):
+            history.restore(i)
+            assert (vm.position, vm.box, vm.tape.position, [vm.tape.get_at(p) for p in range(-5, 40)], vm.loops) == states[i]
+
+        history.restore(100)
+        assert vm.execute() is Status.FINISHED and vm.tape.position == states[-1][2]
+        history.record()
+        assert len(history) == 102
+
+
+def test_profiler():
+    compiler = Compiler()
+    bytecode = compiler.compile('ЭТО Шаг ПЛЮС ВПРАВО ЕСЛИ ПУСТО ТО ВЛЕВО КОНЕЦ '
+                                'ЭТО Программа ПИШИ 5 ПОВТОРИ 20 Шаг ПОКА НЕ ПУСТО ВЛЕВО КОНЕЦ')
+    command = compiler.compile_one_command('Программа')
+    plain, profiled = Vm(), Vm()
+    profiled.profiler = Profiler()
+    plain.run(bytecode, command)
+    profiled.run(bytecode, command)
+
+    data = profiled.profiler.as_dict(compiler.procedures, compiler.tags)
+    assert list(profiled.tape.get_preview()) == list(plain.tape.get_preview()) and profiled.steps == plain.steps
+    assert sum(data['opcodes'].values()) == profiled.steps and data['opcodes']['LOOP_NEXT'] == 20
+    assert list(data['procedures']) == ['ШАГ', 'ПРОГРАММА', 'команда']
+    assert data['tape'] == (-1, 1) and data['max_call_stack'] == 3
+    assert profiled.profiler.report(compiler.procedures, compiler.tags).startswith('Процедура')
+
+
+def test_jit():
+    code = '''
+    ЭТО Шаг ПЛЮС ВПРАВО ЯЩИК+ ЕСЛИ Я>Л ТО ОБМЕН ИНАЧЕ { ВЛЕВО ВПРАВО } КОНЕЦ
+    ЭТО Шаги ПИШИ А ПОВТОРИ 3 Шаг КОНЕЦ
+    ЭТО Рекурсия ЕСЛИ НЕ ПУСТО ТО { ВПРАВО Рекурсия } КОНЕЦ
+    ЭТО Программа ПОВТОРИ 30 Шаги ПОКА НЕ ПУСТО ВЛЕВО ВПРАВО Рекурсия ПОВТОРИ 40 { ВЛЕВО МИНУС } КОНЕЦ
+    '''
+
+    def state(vm, status):
+        return (status, repr(vm.error), vm.box, vm.position, vm.steps, vm.stack, vm.call_stack, vm.loops,
+                vm.tape.position, list(vm.tape.get_preview()))
+
+    for compiler in (Compiler(), Compiler(optimize=True)):
+        bytecode, command = compiler.compile(code), compiler.compile_one_command('Программа')
+        for steps in (None, 1, 7, 100):
+            states = []
+            for vm in (Vm(), Vm(jit=True)):
+                vm.startup(bytecode, command)
+                status = Status.BUDGET
+                while status is Status.BUDGET:
+                    status = vm.execute(steps=steps)
+                    states.append(state(vm, status))
+            assert states[:len(states) // 2] == states[len(states) // 2:]
+            assert status is Status.ERROR  # МИНУС на пустой ячейке
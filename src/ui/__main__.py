@@ -23,7 +23,7 @@ if __name__ == '__main__':
         font-family: monospace;
     }''')
 
-    w = Window()
+    w = Window(optimize='-O' in sys.argv[1:])
     w.setWindowTitle('Корректор')
     w.resize(800, 500)
     w.show()
@@ -1,22 +1,36 @@
-from PySide6 import QtWidgets
+from PySide6 import QtWidgets, QtCore
 
+from .runner import Runner, speed_delay
 from .tape_widget import TapeWidget
 from ..compiler import Compiler
 from ..errors import CorrectorException
-from ..vm import Vm
+from ..vm import Vm, Status, History
+
+FASTEST = 10  # Положение ползунка скорости без анимации
 
 
 class Window(QtWidgets.QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, optimize=False):
         QtWidgets.QWidget.__init__(self, parent)
 
         self.vm = Vm()
-        self.compiler = Compiler()
+        self.compiler = Compiler(incremental=True, optimize=optimize)
 
         self.code_input = QtWidgets.QTextEdit()
         self.go_button = QtWidgets.QPushButton('GO')
         self.reset_button = QtWidgets.QPushButton('-')
+        self.stop_button = QtWidgets.QPushButton('■')
         self.commands_input = QtWidgets.QLineEdit()
+        self.speed = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+        self.timeline = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
+
+        self.thread = None
+        self.runner = None
+        self.history = None
+        self.last_run = None  # (программа, команда) последнего запуска: после перемотки GO продолжает его
+        # Перерисовка ленты во время выполнения -- не чаще частоты обновления экрана
+        self.repaint_timer = QtCore.QTimer(self)
+        self.repaint_timer.timeout.connect(lambda: self.tape.update())
 
         self.alphabet_labels = [QtWidgets.QLabel('ПУСТО 0 1 2 3 4 5 6'),
                                 QtWidgets.QLabel('7 8 9 А Б В Г Д Е Ё Ж'),
@@ -30,9 +44,19 @@ class Window(QtWidgets.QWidget):
         self.go_button.clicked.connect(self.run_command)
         self.commands_input.returnPressed.connect(self.run_command)
         self.reset_button.clicked.connect(self.reset)
+        self.stop_button.clicked.connect(self.stop)
+        self.speed.valueChanged.connect(self.set_speed)
+        self.timeline.valueChanged.connect(self.travel)
 
         self.go_button.setFixedWidth(30)
         self.reset_button.setFixedWidth(30)
+        self.stop_button.setFixedWidth(30)
+        self.stop_button.setEnabled(False)
+        self.speed.setRange(0, FASTEST)
+        self.speed.setValue(FASTEST)
+        self.speed.setToolTip('Скорость выполнения')
+        self.timeline.setEnabled(False)
+        self.timeline.setToolTip('Перемотка выполнения')
 
         self.grid = QtWidgets.QGridLayout()
         self.alphabet_box = QtWidgets.QVBoxLayout()
@@ -44,31 +68,122 @@ class Window(QtWidgets.QWidget):
             self.alphabet_box.addWidget(lbl)
         self.alphabet_group.setLayout(self.alphabet_box)
 
-        self.grid.addWidget(self.code_input, 0, 1, 3, 3)
+        self.grid.addWidget(self.code_input, 0, 1, 3, 4)
         self.grid.addWidget(self.reset_button, 3, 1)
         self.grid.addWidget(self.go_button, 3, 2)
         self.grid.addWidget(self.commands_input, 3, 3)
+        self.grid.addWidget(self.stop_button, 3, 4)
+        self.grid.addWidget(self.speed, 4, 1, 1, 4)
+        self.grid.addWidget(self.timeline, 5, 1, 1, 4)
         self.grid.addWidget(self.alphabet_group, 2, 0, 2, 1)
         self.grid.addWidget(self.tape, 0, 0, 2, 1)
 
         self.setLayout(self.grid)
 
     def reset(self):
+        self.stop()
+        self.history = None
+        self.timeline.setEnabled(False)
         self.vm = Vm()
-        self.compiler = Compiler()
+        self.tape.vm = self.vm
+        self.tape.update()
 
     def run_command(self):
+        if self.thread is not None:
+            return
+
         command = self.commands_input.text()
         code = self.code_input.toPlainText()
 
+        if (self.history is not None and self.last_run == (code, command)
+                and self.history.current < len(self.history) - 1):
+            self.start()  # Продолжение с перемотанного места: машина уже в его состоянии
+            return
+
         try:
-            bc = self.compiler.compile(code)
+            bc = self.compiler.compile(code)  # Неизменённая программа берётся из кэша
             command_bc = self.compiler.compile_one_command(command)
-
-            self.vm.run(bc, command_bc)
-            self.tape.update()
+            self.go_button.setToolTip('Кэш компиляции: попаданий {0.hits}, промахов {0.misses}'.format(self.compiler.cache.info()))
         except CorrectorException as e:
             self.error(e)
+            return
+
+        if command_bc:
+            self.vm.startup(bc, command_bc)
+            self.last_run = (code, command)
+            self.history = History(self.vm)
+            self.history.record()
+            self.start()
+
+    def start(self):
+        """Запуск (или продолжение) выполнения в отдельном потоке"""
+        self.thread = QtCore.QThread(self)
+        self.runner = Runner(self.vm, speed_delay(self.speed.value(), FASTEST), self.history)
+        self.runner.moveToThread(self.thread)
+        self.thread.started.connect(self.runner.run)
+        self.runner.finished.connect(self.thread.quit, QtCore.Qt.ConnectionType.DirectConnection)
+        self.runner.finished.connect(self.finished)
+
+        self.go_button.setEnabled(False)
+        self.tape.setEnabled(False)
+        self.timeline.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.repaint_timer.start(max(1, round(1000 / self.screen().refreshRate())))
+        self.thread.start()
+
+    def stop(self):
+        if self.runner is not None:
+            self.runner.stop()
+            self.thread.wait()
+            # Сигнал finished ещё в очереди, а последний отрезок выполнения мог закончиться ошибкой
+            self.finished(self.runner.status)
+
+    def finished(self, status):
+        if self.thread is None:  # Уже остановлено кнопкой
+            return
+        stopped = self.runner.stopped
+        self.thread.quit()
+        self.thread.wait()
+        self.thread = self.runner = None
+
+        self.repaint_timer.stop()
+        self.go_button.setEnabled(True)
+        self.tape.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.tape.update()
+
+        self.timeline.blockSignals(True)  # Машина уже в последнем состоянии
+        self.timeline.setRange(0, len(self.history) - 1)
+        self.timeline.setValue(self.history.current)
+        self.timeline.blockSignals(False)
+        self.timeline.setEnabled(True)
+
+        if status is Status.ERROR:
+            self.error(self.vm.error)
+        elif status is Status.BUDGET and not stopped and self.ask_continue():
+            self.start()
+
+    def travel(self, i: int):
+        """Переход к i-му снимку записанного выполнения. Если программа и команда не изменились, GO продолжает
+        выполнение с этого места, иначе запускает команду заново на ленте этого снимка
+        """
+        if self.thread is None and self.history is not None:
+            self.history.restore(i)
+            self.tape.update()
+
+    def set_speed(self, speed: int):
+        if self.runner is not None:
+            self.runner.delay = speed_delay(speed, FASTEST)
+
+    def ask_continue(self) -> bool:
+        """Команда выполнила DEFAULT_STEPS шагов и не закончилась: продолжать или остановить"""
+        self.tape.update()
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Долгое выполнение",
+            f'Выполнено {self.vm.steps} шагов, команда ещё не закончилась. Продолжить?',
+        )
+        return answer == QtWidgets.QMessageBox.Yes
 
     def error(self, e):
         if len(e.args) > 1:
@@ -0,0 +1,55 @@
+import time
+
+from PySide6 import QtCore
+
+from ..vm import Status, DEFAULT_STEPS
+from ..vm.vm import WAIT_TIME
+
+SLICE_TIME = 0.05  # Как часто без анимации проверяется кнопка остановки, с
+
+
+class Runner(QtCore.QObject):
+    """Выполняет команду, загруженную в машину (Vm.startup), в отдельном потоке.
+
+    delay -- пауза после каждой команды, изменившей ленту (0 -- без анимации). Лента при этом не
+    перерисовывается: окно само читает её по таймеру, не чаще частоты обновления экрана.
+    history -- History, в который записывается снимок после каждого шага анимации или, без анимации, после
+    каждых SLICE_TIME секунд выполнения.
+    """
+    finished = QtCore.Signal(object)  # Status
+
+    def __init__(self, vm, delay: float = 0, history=None):
+        QtCore.QObject.__init__(self)
+
+        self.vm = vm
+        self.delay = delay
+        self.history = history
+        self.stopped = False
+        self.status = None  # Итог run, пока finished ещё не доставлен в окно
+
+    def stop(self):
+        self.stopped = True
+
+    @QtCore.Slot()
+    def run(self):
+        vm = self.vm
+        limit = vm.steps + DEFAULT_STEPS
+        status = Status.BUDGET
+        while status is Status.BUDGET and not self.stopped and vm.steps < limit:
+            if self.delay:
+                tape = vm.tape
+                before = tape.position, tape.get(), vm.box
+                status = vm.execute(steps=1)
+                if (tape.position, tape.get(), vm.box) != before:
+                    time.sleep(self.delay)
+            else:
+                status = vm.execute(steps=limit - vm.steps, seconds=SLICE_TIME)
+            if self.history is not None and status is not Status.ERROR:
+                self.history.record()
+        self.status = status
+        self.finished.emit(status)
+
+
+def speed_delay(speed: int, fastest: int) -> float:
+    """Положение ползунка скорости -> пауза анимации: от WAIT_TIME до 0 на самой большой скорости"""
+    return WAIT_TIME * (fastest - speed) / fastest
@@ -1,11 +1,6 @@
 from PySide6 import QtWidgets, QtCore
 
-symbols = [' ', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
-           'А', 'Б', 'В', 'Г', 'Д', 'Е', 'Ё', 'Ж', 'З','И', 'Й', 'К',
-           'Л', 'М', 'Н', 'О', 'П', 'Р', 'С', 'Т', 'У', 'Ф', 'Х',
-           'Ц', 'Я', 'Ш', 'Щ', 'Ъ', 'Ы', 'Ь', 'Э', 'Ю', 'Я', '␣',
-           '-', '+', '/', '*', '=', '<', '>', '(', ')', '[', ']', '{', '}', '.',
-           ',', '!', '?', ';', ':', '\'', '"', '#', '|', '$', '%', '~', '@']
+from ..alphabet import symbols
 
 class TapeWidget(QtWidgets.QWidget):
     def __init__(self, vm, parent=None):
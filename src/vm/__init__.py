@@ -1 +1,3 @@
-from .vm import Vm
+from .vm import Vm, Tape, SparseTape, Status, Snapshot, DEFAULT_STEPS
+from .history import History
+from .profiler import Profiler
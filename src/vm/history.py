@@ -0,0 +1,30 @@
+from .vm import Vm
+
+CHECKPOINT = 64  # Каждый CHECKPOINT-й снимок -- полный
+
+
+class History:
+    """Снимки состояния машины для перемотки выполнения назад.
+
+    Переход к снимку i восстанавливает ближайший полный снимок не позже i и применяет изменения ленты из
+    следующих за ним, то есть стоит не больше CHECKPOINT снимков независимо от длины записи.
+    """
+    def __init__(self, vm: Vm, checkpoint: int = CHECKPOINT):
+        self.vm = vm
+        self.checkpoint = checkpoint
+        self.snapshots = []
+        self.current = -1  # Номер снимка, которому соответствует состояние машины
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def record(self):
+        """Снимок текущего состояния. Снимки после восстановленного отбрасываются"""
+        del self.snapshots[self.current + 1:]
+        self.snapshots.append(self.vm.snapshot(full=len(self.snapshots) % self.checkpoint == 0))
+        self.current = len(self.snapshots) - 1
+
+    def restore(self, i: int):
+        start = i - i % self.checkpoint
+        self.vm.restore(self.snapshots[start:i + 1])
+        self.current = i
@@ -0,0 +1,444 @@
+"""
+Трансляция загруженной программы (Vm.load) в функции Python: Vm(jit=True).
+
+Функция строится для каждого адреса, с которого машина может продолжить выполнение после перехода: начала
+тега и адреса возврата. Она выполняет команды подряд до вызова другого тега или возврата и возвращает пару
+(адрес следующей команды, число выполненных команд). Хвостовые переходы к известному тегу продолжаются
+в той же функции, а переход к её же началу (цикл ПОКА) становится циклом while: функция повторяет его,
+пока не исчерпает переданный ей лимит шагов left. Стек значений разбирается при трансляции: значения
+держатся в локальных переменных, а в Vm.stack попадает только то, что остаётся на нём при выходе из функции.
+Переходы вперёд (SKIP...) становятся if/else, а ПОВТОРИ с телом без переходов -- циклом for.
+
+Вызовы и возвраты идут через Vm.call_stack и Vm.loops, как у интерпретатора, поэтому между функциями можно
+остановиться и продолжить интерпретатором, и наоборот. Для каждой функции известно наибольшее число команд,
+которое она может выполнить: если оно не укладывается в оставшийся лимит шагов, команды выполняет
+интерпретатор. Ошибка исполнителя внутри функции (Failure) несёт адрес команды и состояние стеков в этот
+момент, так что ошибка случается там же, где у интерпретатора.
+"""
+import functools
+import hashlib
+
+from .. import bytecode as bc
+from ..compiler.cache import CompileCache
+
+TAIL = 0x80  # Как vm.TAIL
+CACHE_SIZE = 32  # Программ в кэше оттранслированных функций
+BLOCK_SIZE = 256  # Наибольшее число команд, транслируемых в одну функцию
+
+# Команды перехода к тегу: после них начинается новая функция (адрес возврата)
+JUMPS = {bc.POP_JUMP, bc.POP_JUMP_IF, bc.POP_JUMP_IF_ELSE, bc.REPEAT, bc.CALL, bc.JUMP_IF_TAPE_EQ, bc.JUMP_IF_TAPE_NE}
+COMPARISONS = {bc.EQUAL: '==', bc.MORE: '>', bc.LESS: '<', bc.NOT_EQUAL: '!='}
+
+cache = CompileCache(CACHE_SIZE)
+
+
+class Failure(Exception):
+    """Ошибка исполнителя в оттранслированной функции: адрес команды, выполнено команд до неё в функции,
+    незавершённые циклы ПОВТОРИ ((адрес возврата или None, осталось повторений), ...) и значения на стеке
+    """
+    def __init__(self, pc: int, steps: int, loops: tuple, stack: list):
+        super().__init__(pc, steps, loops, stack)
+        self.pc, self.steps, self.loops, self.stack = pc, steps, loops, stack
+
+
+class Unsupported(Exception):
+    """Участок кода, который транслятор не разбирает: его выполнит интерпретатор"""
+
+
+def translate(program, operands: dict) -> list:
+    """Функции программы: список длиной с программу, по адресу -- (функция, наибольшее число команд за проход)
+    или None. operands -- vm.OPERANDS. Результат кэшируется по хэшу программы.
+    """
+    key = hashlib.blake2b(program.tobytes(), digest_size=16).digest()
+    translated = cache.get(key)
+    if translated is None:
+        translated = Program(program, operands)
+        cache.put(key, translated)
+    return translated.blocks
+
+
+class Program:
+    """Функции программы транслируются при первом переходе к ним: до этого на их месте в blocks заглушка,
+    которая ничего не выполняет (0 команд), а только ставит на своё место функцию
+    """
+    def __init__(self, program, operands: dict):
+        self.program = program
+        self.sizes = {}
+        pc = 0
+        while pc < len(program):
+            self.sizes[pc] = 1 + len(operands[program[pc]])
+            pc += self.sizes[pc]
+
+        entries = {0}
+        for pc, size in self.sizes.items():
+            if program[pc] & ~TAIL in JUMPS or program[pc] == bc.RETURN:
+                entries.add(pc + size)  # Адрес возврата или начало следующего тега
+        self.blocks = [None] * len(program)
+        for pc in entries:
+            if pc < len(program):
+                self.blocks[pc] = (functools.partial(self.compile, pc), 0)
+
+    def compile(self, pc: int, *state) -> tuple[int, int]:
+        block = Translator(self.program, self.sizes).block(pc)
+        if block is None:
+            self.blocks[pc] = None
+        else:
+            namespace = {'Failure': Failure}
+            exec(compile(block[0], f'<jit {pc}>', 'exec'), namespace)
+            self.blocks[pc] = (namespace[f'b{pc}'], block[1])
+        return pc, 0
+
+
+class Translator:
+    """Трансляция одной функции. self.k -- выполнено команд с последнего «n += », self.steps -- наибольшее
+    число выполненных команд на текущем пути, self.limit -- наибольшее среди путей, которые уже вышли
+    """
+    def __init__(self, code, sizes: dict):
+        self.code = code
+        self.sizes = sizes
+        self.start = None
+        self.visited = set()  # Начала участков, уже оттранслированных в эту функцию
+        self.count = 0  # Оттранслировано команд
+        self.looped = False
+        self.lines = []
+        self.indent = 1
+        self.values = []  # Стек значений: выражения без побочных действий
+        self.frames = ()  # Циклы ПОВТОРИ вокруг текущего места: (адрес возврата или None, переменная счётчика)
+        self.names = 0
+        self.k = self.steps = self.limit = 0
+
+    def block(self, start: int) -> tuple[str, int] | None:
+        """Исходный текст функции и наибольшее число команд за один проход по ней"""
+        self.start = start
+        self.visited.add(start)
+        terminated = self.range(start, None)
+        if not terminated:  # Дальше команда, которую выполнит интерпретатор
+            self.exit(str(self.pc), follow=False)
+        if self.limit == 0:
+            return None
+        header = [f'def b{start}(vm, tape, stack, call_stack, loops, left):', '    n = 0']
+        if self.looped:
+            header += [f'    L = {self.limit}', '    while True:']
+            self.lines = ['    ' + line for line in self.lines]
+        return '\n'.join(header + self.lines), self.limit
+
+    # Вывод кода
+
+    def emit(self, line: str):
+        self.lines.append('    ' * self.indent + line)
+
+    def name(self) -> str:
+        self.names += 1
+        return f'v{self.names}'
+
+    def push(self, expression: str):
+        """Значение вычисляется сразу: потом лента или ящик могут измениться"""
+        name = self.name()
+        self.emit(f'{name} = {expression}')
+        self.values.append(name)
+
+    def pop(self) -> str:
+        if self.values:
+            return self.values.pop()
+        name = self.name()
+        self.emit(f'{name} = stack.pop()')
+        return name
+
+    def sync(self):
+        if self.k:
+            self.emit(f'n += {self.k}')
+            self.k = 0
+
+    def flush(self):
+        """Переносит стек значений в Vm.stack"""
+        for value in self.values:
+            self.emit(f'stack.append({value})')
+        self.values = []
+
+    def exit(self, target: str, ret: int = None, follow: bool = True):
+        """Выход из функции к target (выражение), ret -- адрес возврата для call_stack.
+
+        Хвостовой переход (ret is None) к известному адресу при follow транслируется дальше в этой же функции.
+        """
+        if self.frames:
+            raise Unsupported
+        if follow and ret is None and target.isdigit():
+            address = int(target)
+            if address == self.start:  # Следующий проход цикла, если он уложится в лимит
+                self.flush()
+                self.sync()
+                self.emit('if n + L > left:')
+                self.emit(f'    return {address}, n')
+                self.emit('continue')
+                self.looped = True
+                self.limit = max(self.limit, self.steps)
+                return
+            if address not in self.visited and self.count < BLOCK_SIZE:
+                self.visited.add(address)
+                if not self.range(address, None):
+                    self.exit(str(self.pc), follow=False)
+                return
+        for value in self.values:
+            self.emit(f'stack.append({value})')
+        if ret is not None:
+            self.emit(f'call_stack.append({ret})')
+        self.emit(f'return {target}, n + {self.k}' if self.k else f'return {target}, n')
+        self.limit = max(self.limit, self.steps)
+
+    def fail(self, pc: int):
+        loops = ''.join(f'({ret}, {counter}), ' for ret, counter in self.frames)
+        self.emit(f'    raise Failure({pc}, n + {self.k}, ({loops}), [{", ".join(self.values)}])')
+
+    def step(self):
+        self.k += 1
+        self.steps += 1
+
+    # Трансляция
+
+    def range(self, pc: int, stop: int | None) -> bool:
+        """Транслирует команды с pc до stop (None -- до выхода из функции). Возвращает True, если путь
+        закончился выходом из функции. Останавливается перед командой, которую не разбирает, в self.pc
+        """
+        code = self.code
+        while pc != stop:
+            self.pc = pc
+            if pc not in self.sizes:
+                if stop is None and not self.frames:  # Конец программы
+                    return False
+                raise Unsupported
+            self.count += 1
+            op, size = code[pc], self.sizes[pc]
+            tail = op & TAIL
+            op &= ~TAIL
+            state = (len(self.lines), self.indent, list(self.values), self.k, self.steps, self.limit)
+            try:
+                result = self.instruction(op, pc, size, tail)
+            except Unsupported:
+                if stop is not None or self.frames:  # Внутри if или цикла остановиться нельзя
+                    raise
+                del self.lines[state[0]:]
+                self.indent, self.values, self.k, self.steps, self.limit = state[1:]
+                self.pc = pc
+                return False
+            if result is True:
+                return True
+            pc = pc + size if result is None else result
+        return False
+
+    def instruction(self, op: int, pc: int, size: int, tail: int):
+        """Транслирует команду. Возвращает True при выходе из функции, адрес следующей команды или None"""
+        code = self.code
+        arg = code[pc + 1] if size > 1 else None
+        ret = None if tail else pc + size
+
+        if op == bc.LOAD_TAG or op == bc.LOAD_SYMBOL:
+            self.step()
+            self.values.append(str(arg))
+        elif op == bc.BIN_OP:
+            self.step()
+            top = self.pop()
+            second = self.pop()
+            self.push(f'{top} {COMPARISONS[arg]} {second}')
+        elif op == bc.RIGHT:
+            self.step()
+            self.emit('tape.move_right()')
+        elif op == bc.LEFT:
+            self.step()
+            self.emit('tape.move_left()')
+        elif op == bc.POP_SET_BOX:
+            self.step()
+            self.emit(f'vm.box = {self.pop()}')
+        elif op == bc.LOAD_BOX:
+            self.step()
+            self.push('vm.box')
+        elif op == bc.POP_SET_TAPE:
+            self.step()
+            self.emit(f'tape.set({self.pop()})')
+        elif op == bc.LOAD_TAPE:
+            self.step()
+            self.push('tape.get()')
+        elif op == bc.POP_NEXT_PUSH or op == bc.POP_PREV_PUSH:
+            value = self.pop()
+            self.emit(f'if {value} == 72:' if op == bc.POP_NEXT_PUSH else f'if {value} <= 1:')
+            self.fail(pc)
+            self.step()
+            self.push(f'{value} + 1' if op == bc.POP_NEXT_PUSH else f'{value} - 1')
+        elif op == bc.BOOL_NOT:
+            self.step()
+            self.push(f'not {self.pop()}')
+        elif op == bc.IS_DIGIT:
+            self.step()
+            self.push(f'1 < {self.pop()} < 12')
+        elif op == bc.INC_TAPE or op == bc.DEC_TAPE:
+            value = self.name()
+            self.emit(f'{value} = tape.get()')
+            self.emit(f'if {value} == 72:' if op == bc.INC_TAPE else f'if {value} <= 1:')
+            self.fail(pc)
+            self.step()
+            self.emit(f'tape.set({value} + 1)' if op == bc.INC_TAPE else f'tape.set({value} - 1)')
+        elif op == bc.ADD_TAPE:
+            value = self.name()
+            self.emit(f'{value} = tape.get()')
+            if arg > 0:
+                self.emit(f'if {value} + {arg} > 72:')
+                self.emit('    tape.set(72)')
+            else:
+                self.emit(f'if {value} + {arg} < 1:')
+                self.emit(f'    if {value}:')
+                self.emit('        tape.set(1)')
+            self.fail(pc)
+            self.step()
+            self.emit(f'tape.set({value} + {arg})')
+        elif op == bc.SWAP_BOX:
+            self.step()
+            value = self.name()
+            self.emit(f'{value} = vm.box')
+            self.emit('vm.box = tape.get()')
+            self.emit(f'tape.set({value})')
+        elif op == bc.SET_TAPE_IMM:
+            self.step()
+            self.emit(f'tape.set({arg})')
+        elif op == bc.TAPE_EQ_IMM:
+            self.step()
+            self.push(f'tape.get() == {arg}')
+        elif op == bc.MOVE_BY:
+            self.step()
+            self.emit(f'tape.move_by({arg})')
+        elif op == bc.SCAN_RIGHT_UNTIL or op == bc.SCAN_LEFT_UNTIL:
+            self.step()
+            self.emit(f'if not tape.{"scan_right" if op == bc.SCAN_RIGHT_UNTIL else "scan_left"}({arg}):')
+            self.branch_exit(str(pc), follow=False)  # Символа нет: команда повторяется, её выполнит интерпретатор
+        elif op == bc.RETURN:
+            self.step()
+            self.exit('call_stack.pop()')
+            return True
+        elif op == bc.CALL:
+            self.step()
+            self.exit(str(arg), ret)
+            return True
+        elif op == bc.POP_JUMP:
+            self.step()
+            target = self.pop()
+            self.exit(target, ret)
+            return True
+        elif op == bc.POP_JUMP_IF:
+            self.step()
+            self.emit(f'if {self.pop()}:')
+            self.branch_exit(str(arg), ret)
+        elif op == bc.POP_JUMP_IF_ELSE:
+            self.step()
+            condition = self.pop()
+            self.exit(f'({arg} if {condition} else {code[pc + 2]})', ret)
+            return True
+        elif op == bc.JUMP_IF_TAPE_EQ or op == bc.JUMP_IF_TAPE_NE:
+            self.step()
+            self.emit(f'if tape.get() {"==" if op == bc.JUMP_IF_TAPE_EQ else "!="} {arg}:')
+            self.branch_exit(str(code[pc + 2]), ret)
+        elif op == bc.LOOP_NEXT:
+            self.step()
+            self.flush()
+            self.emit('loops[-1] -= 1')
+            self.emit('if loops[-1]:')
+            self.branch_exit(str(arg))
+            self.emit('loops.pop()')
+        elif op == bc.REPEAT:
+            return self.repeat(pc, arg, code[pc + 2], ret, tail)
+        elif op == bc.SKIP_IF_NOT:
+            self.step()
+            return self.skip(pc, size, self.pop())
+        elif op == bc.SKIP_IF_TAPE_EQ or op == bc.SKIP_IF_TAPE_NE:
+            self.step()
+            return self.skip(pc, size, f'tape.get() {"!=" if op == bc.SKIP_IF_TAPE_EQ else "=="} {arg}')
+        else:  # SKIP вне if/else
+            raise Unsupported
+
+    def branch_exit(self, target: str, ret: int = None, follow: bool = True):
+        """Выход из функции внутри if: стек значений и счётчики остаются и для продолжения после if"""
+        values, k, steps = list(self.values), self.k, self.steps
+        self.indent += 1
+        self.exit(target, ret, follow)
+        self.indent -= 1
+        self.values, self.k, self.steps = values, k, steps
+
+    def skip(self, pc: int, size: int, condition: str):
+        """if/else из пропусков вперёд: SKIP_IF... <then> [SKIP <else>]. condition -- условие выполнения then"""
+        target = self.code[pc + size - 1]
+        then_stop, end = target, target
+        last = self.last_instruction(pc + size, target)
+        if last is not None and self.code[last] == bc.SKIP and self.code[last + 1] >= target:
+            then_stop, end = last, self.code[last + 1]
+        self.flush()
+        self.sync()
+
+        steps = self.steps
+        self.emit(f'if {condition}:')
+        self.indent += 1
+        self.emit('pass')
+        then_exits = self.range(pc + size, then_stop)
+        if not then_exits and then_stop != target:
+            self.step()  # SKIP в конце then
+        self.flush()
+        self.sync()
+        then_steps, self.steps = self.steps, steps
+        self.indent -= 1
+
+        else_exits = False
+        if end != target:
+            self.emit('else:')
+            self.indent += 1
+            self.emit('pass')
+            else_exits = self.range(target, end)
+            self.flush()
+            self.sync()
+            self.indent -= 1
+        self.steps = max(then_steps if not then_exits else 0, self.steps if not else_exits else 0)
+        return True if then_exits and else_exits else end
+
+    def last_instruction(self, pc: int, stop: int) -> int | None:
+        last = None
+        while pc < stop:
+            if pc not in self.sizes:
+                raise Unsupported
+            last, pc = pc, pc + self.sizes[pc]
+        if pc != stop:
+            raise Unsupported
+        return last
+
+    def repeat(self, pc: int, count: int, body: int, ret: int | None, tail: int):
+        """ПОВТОРИ: тело без переходов -- цикл for, иначе переход к телу"""
+        self.step()
+        if not count:
+            return None
+        end = body
+        while end in self.sizes and self.code[end] & ~TAIL != bc.LOOP_NEXT:
+            end += self.sizes[end]
+        if end in self.sizes and self.code[end + 1] == body and self.code[end + 2] == bc.RETURN:
+            state = (len(self.lines), self.indent, list(self.values), self.k, self.steps, self.limit, self.frames)
+            self.flush()
+            self.sync()
+            counter = self.name()
+            self.emit(f'for {counter} in range({count}, 0, -1):')
+            self.indent += 1
+            self.frames += ((ret, counter),)
+            steps, self.steps = self.steps, 0
+            try:
+                self.range(body, end)
+                self.flush()
+                self.step()  # LOOP_NEXT
+                self.sync()
+                self.frames = self.frames[:-1]
+                self.indent -= 1
+                self.steps = steps + count * self.steps + 1  # Последнее повторение заканчивается RETURN тела
+                self.k += 1
+                if tail:  # RETURN тела возвращает сразу в вызвавший тег
+                    self.exit('call_stack.pop()')
+                    return True
+                return None
+            except Unsupported:
+                del self.lines[state[0]:]
+                self.indent, self.values, self.k, self.steps, self.limit, self.frames = state[1:]
+
+        self.flush()
+        self.emit(f'loops.append({count})')
+        self.exit(str(body), ret)
+        return True
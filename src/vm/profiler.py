@@ -0,0 +1,92 @@
+"""Профилирование выполнения: Vm.profiler = Profiler() включает его, None -- выключает"""
+from array import array
+from collections import Counter, defaultdict
+
+from .. import bytecode as bc
+
+COMMAND = -1  # «Тег» команды, введённой пользователем
+OPCODE_NAMES = {value: name for name, value in vars(bc.byte_commands).items()
+                if name.isupper() and name not in ('EQUAL', 'MORE', 'LESS', 'NOT_EQUAL')}
+
+
+class Profiler:
+    """Счётчики выполнения: команд по кодам, команд и времени по тегам, наибольшая глубина стеков
+    и крайние положения на ленте
+    """
+    def __init__(self):
+        self.opcodes = Counter()
+        self.tags = Counter()
+        self.times = defaultdict(float)
+        self.max_call_stack = 0
+        self.max_stack = 0
+        self.tape_min = self.tape_max = None
+
+        self.code = None
+        self.owners = array('i')  # Адрес в загруженном коде -> номер тега
+
+    def attach(self, code: array, tags: dict, program_size: int):
+        """Готовит соответствие адресов тегам для кода code (программа длиной program_size, за ней команда)"""
+        if code is self.code:
+            return
+        self.code = code
+        self.owners = array('i', [COMMAND]) * len(code)
+        starts = sorted((address, tag_id) for tag_id, address in tags.items() if address < program_size)
+        for (start, tag_id), (end, _) in zip(starts, starts[1:] + [(program_size, None)]):
+            self.owners[start:end] = array('i', [tag_id]) * (end - start)
+
+    def tape(self, position: int):
+        if self.tape_min is None or position < self.tape_min:
+            self.tape_min = position
+        if self.tape_max is None or position > self.tape_max:
+            self.tape_max = position
+
+    def as_dict(self, procedures: dict = None, tags: list = None) -> dict:
+        """procedures и tags -- Compiler.procedures и Compiler.tags, чтобы собрать счётчики по процедурам"""
+        result = {
+            'opcodes': {OPCODE_NAMES.get(op, op): n for op, n in self.opcodes.most_common()},
+            'tags': {tag_id: {'steps': n, 'time': self.times[tag_id]} for tag_id, n in self.tags.most_common()},
+            'max_call_stack': self.max_call_stack,
+            'max_stack': self.max_stack,
+            'tape': (self.tape_min, self.tape_max),
+        }
+        if procedures is not None:
+            totals = {}
+            owners = procedure_tags(procedures, tags)
+            for tag_id, counters in result['tags'].items():
+                name = owners.get(tag_id, 'команда' if tag_id == COMMAND else str(tag_id))
+                total = totals.setdefault(name, {'steps': 0, 'time': 0.0})
+                total['steps'] += counters['steps']
+                total['time'] += counters['time']
+            result['procedures'] = dict(sorted(totals.items(), key=lambda item: -item[1]['steps']))
+        return result
+
+    def report(self, procedures: dict = None, tags: list = None) -> str:
+        """Текстовый отчёт, строки отсортированы по числу шагов"""
+        data = self.as_dict(procedures, tags)
+        lines = []
+        if 'procedures' in data:
+            lines.append(f'{"Процедура":<24}{"шагов":>12}{"мс":>10}')
+            for name, counters in data['procedures'].items():
+                lines.append(f'{name:<24}{counters["steps"]:>12}{counters["time"] * 1000:>10.1f}')
+            lines.append('')
+        lines.append(f'{"Команда":<24}{"шагов":>12}')
+        for name, n in data['opcodes'].items():
+            lines.append(f'{name:<24}{n:>12}')
+        lines.append('')
+        lines.append(f'Глубина стека вызовов: {data["max_call_stack"]}, стека: {data["max_stack"]}')
+        if data['tape'][0] is not None:
+            lines.append(f'Лента: от {data["tape"][0]} до {data["tape"][1]}')
+        return '\n'.join(lines)
+
+
+def procedure_tags(procedures: dict, tags: list) -> dict:
+    """Номер тега -> имя процедуры, которой он принадлежит (сама процедура и её блоки)"""
+    owners = {tag_id: name for name, tag_id in procedures.items()}
+    for name, tag_id in procedures.items():
+        pending = [tag_id]
+        while pending:
+            for ref in bc.tag_refs(tags[pending.pop()]):
+                if ref not in owners:
+                    owners[ref] = name
+                    pending.append(ref)
+    return owners
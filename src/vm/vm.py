@@ -21,46 +21,179 @@ TAG <id> | 0x00 <id> -- начало тега
 0x10 -- RETURN
 0x11 -- BOOL_NOT
 0x12 -- IS_DIGIT
+0x13 <count> <tag> -- REPEAT <count> <tag> | выполнить тег count раз (count -- два байта)
+0x14 <tag> -- LOOP_NEXT <tag> | конец тела цикла ПОВТОРИ: ещё раз в начало тега или дальше
+
+Объединённые команды (их выдаёт оптимизатор):
+0x15 -- INC_TAPE | LOAD_TAPE POP_NEXT_PUSH POP_SET_TAPE
+0x16 -- DEC_TAPE | LOAD_TAPE POP_PREV_PUSH POP_SET_TAPE
+0x17 -- SWAP_BOX | LOAD_BOX LOAD_TAPE POP_SET_BOX POP_SET_TAPE
+0x18 <symbol> -- SET_TAPE_IMM <symbol> | LOAD_SYMBOL <symbol> POP_SET_TAPE
+0x19 <symbol> -- TAPE_EQ_IMM <symbol> | LOAD_SYMBOL <symbol> LOAD_TAPE BIN_OP EQUAL
+0x1A <symbol> <tag> -- JUMP_IF_TAPE_EQ <symbol> <tag> | TAPE_EQ_IMM <symbol> POP_JUMP_IF <tag>
+0x1B <symbol> <tag> -- JUMP_IF_TAPE_NE <symbol> <tag> | TAPE_EQ_IMM <symbol> BOOL_NOT POP_JUMP_IF <tag>
+0x1C <tag> -- CALL <tag> | LOAD_TAG <tag> POP_JUMP
+0x1D <k> -- MOVE_BY <k> | k раз ВПРАВО (k < 0 -- -k раз ВЛЕВО), k -- два байта со знаком
+0x1E <k> -- ADD_TAPE <k> | k раз ПЛЮС (k < 0 -- -k раз МИНУС)
+0x1F <symbol> -- SCAN_RIGHT_UNTIL <symbol> | ПОКА НЕ <symbol> ВПРАВО
+0x20 <symbol> -- SCAN_LEFT_UNTIL <symbol> | ПОКА НЕ <symbol> ВЛЕВО
+0x21 <k> -- SKIP <k> | пропустить k байт после команды (k -- два байта)
+0x22 <k> -- SKIP_IF_NOT <k> | снять значение со стека, если оно ложно -- пропустить k байт
+0x23 <symbol> <k> -- SKIP_IF_TAPE_EQ <symbol> <k> | пропустить k байт, если на ленте symbol
+0x24 <symbol> <k> -- SKIP_IF_TAPE_NE <symbol> <k> | пропустить k байт, если на ленте не symbol
 """
+import enum
+import operator
+import sys
+import time
+from array import array
+from typing import NamedTuple
+
 from .. import errors
 from .. import bytecode as bc
+from . import jit
 
-ByteCommand = tuple[int, int, tuple[int]]
-args_num = {0x00: 2, 0x02: 2, 0x03: 1, 0x04: 1, 0x05: 0, 0x06: 0, 0x07: 0, 0x08: 0, 0x09: 0, 0x0A: 0, 0x0B: 0, 0x0C: 0,
-        0x0D: 0, 0x0E: 2, 0x0F: 4, 0x10: 0, 0x11: 0, 0x12: 0}
 WAIT_TIME = 0.5
+DEFAULT_STEPS = 10 ** 7  # Ограничение шагов по умолчанию для интерфейса и пакетной проверки
+SLICE = 10000  # Шагов между проверками времени
+
+
+class Status(enum.Enum):
+    """Итог Vm.execute"""
+    FINISHED = 'finished'  # Команда выполнена до конца
+    BUDGET = 'budget'  # Исчерпаны шаги или время, выполнение можно продолжить
+    ERROR = 'error'  # Ошибка исполнителя, она в Vm.error
+
+# Аргументы команды в загруженной программе: номер тега (2 байта -> адрес), двухбайтовое число (со знаком
+# или без), длина перехода вперёд (2 байта -> адрес) или один байт
+TAG_ARG, NUMBER_ARG, SIGNED_ARG, SKIP_ARG, BYTE_ARG = 0, 1, 2, 3, 4
+OPERANDS = {}
+for _op, _num in bc.ARGS_NUM.items():
+    _tag_offsets = bc.TAG_ARGS.get(_op, ())
+    _number_offsets = bc.NUMBER_ARGS.get(_op, ())
+    _signed_offsets = bc.SIGNED_ARGS.get(_op, ())
+    _skip_offsets = bc.SKIP_ARGS.get(_op, ())
+    _kinds, _offset = [], 1
+    while _offset <= _num:
+        if _offset in _tag_offsets:
+            _kinds.append(TAG_ARG)
+            _offset += 2
+        elif _offset in _number_offsets:
+            _kinds.append(NUMBER_ARG)
+            _offset += 2
+        elif _offset in _signed_offsets:
+            _kinds.append(SIGNED_ARG)
+            _offset += 2
+        elif _offset in _skip_offsets:
+            _kinds.append(SKIP_ARG)
+            _offset += 2
+        else:
+            _kinds.append(BYTE_ARG)
+            _offset += 1
+    OPERANDS[_op] = tuple(_kinds)
+
+# Переход, за которым сразу следует RETURN, загружается как хвостовой: адрес возврата не записывается,
+# и RETURN вызванного тега сразу возвращает в вызвавший. Так циклы ПОКА и хвостовые вызовы процедур
+# выполняются без роста стека вызовов.
+TAIL = 0x80
+CALLS = (bc.POP_JUMP, bc.POP_JUMP_IF, bc.POP_JUMP_IF_ELSE, bc.REPEAT, bc.CALL, bc.JUMP_IF_TAPE_EQ, bc.JUMP_IF_TAPE_NE)
+for _op in CALLS:
+    OPERANDS[_op | TAIL] = OPERANDS[_op]
+
+COMPARISONS = {bc.EQUAL: operator.eq, bc.MORE: operator.gt, bc.LESS: operator.lt, bc.NOT_EQUAL: operator.ne}
+
+
+class Snapshot(NamedTuple):
+    """Состояние машины (Vm.snapshot). Лента хранится либо целиком (tape), либо как ячейки, изменённые после
+    предыдущего снимка (cells: положение -> символ)
+    """
+    box: int
+    stack: tuple
+    call_stack: tuple
+    loops: tuple
+    position: int
+    steps: int
+    tape_position: int
+    tape: object
+    cells: dict
 
 
 class Vm:
-    """Виртуальная машина"""
-    def __init__(self):
+    """Виртуальная машина
+
+    sparse -- использовать страничную ленту SparseTape: память растёт с числом записанных ячеек, а не с
+    пройденным расстоянием.
+    jit -- выполнять программу функциями Python, в которые она транслируется при загрузке (см. jit.py).
+
+    Перед выполнением байт-код загружается в плоский массив целых чисел self.code: код команды, за ним её
+    аргументы, причём номера тегов уже заменены адресами в этом массиве. Обработчик команды получает её адрес
+    и возвращает адрес следующей.
+    """
+    def __init__(self, sparse: bool = False, jit: bool = False):
         self.box = 0
-        self.tape = Tape()
+        self.tape = SparseTape() if sparse else Tape()
         self.stack = []
         self.call_stack = []
+        self.loops = []  # Оставшиеся повторения вложенных циклов ПОВТОРИ
+        self.steps = 0  # Выполнено команд с последнего startup
+        self.error = None
+        self.profiler = None  # Profiler: выполнение идёт через _execute_profiled
+        self.jit = jit
+        self.blocks = None  # Функции программы (jit.translate), None -- ещё не оттранслирована
 
         self.tags = {}
         self.position = 0
-        self.commands: list[ByteCommand] = []
-
-        self.operations = {0x02: self._load_tag,
-                           0x03: self._load_symbol,
-                           0x04: self._bin_op,
-                           0x05: self._right,
-                           0x06: self._left,
-                           0x07: self._pop_set_box,
-                           0x08: self._load_box,
-                           0x09: self._pop_set_tape,
-                           0x0A: self._load_tape,
-                           0x0B: self._pop_next_push,
-                           0x0C: self._pop_prev_push,
-                           0x0D: self._pop_jump,
-                           0x0E: self._pop_jump_if,
-                           0x0F: self._pop_jump_if_else,
-                           0x10: self._return,
-                           0x11: self._bool_not,
-                           0x12: self._is_digit,
-                           }
+        self.code = array('i')
+
+        self.program = array('i')  # Загруженная программа без команды
+        self.program_tags = {}
+        self.source = None  # Байт-код, из которого загружена self.program
+
+        self.operations = [None] * 256
+        for command, operation in {bc.LOAD_TAG: self._load_tag,
+                                   bc.LOAD_SYMBOL: self._load_symbol,
+                                   bc.BIN_OP: self._bin_op,
+                                   bc.RIGHT: self._right,
+                                   bc.LEFT: self._left,
+                                   bc.POP_SET_BOX: self._pop_set_box,
+                                   bc.LOAD_BOX: self._load_box,
+                                   bc.POP_SET_TAPE: self._pop_set_tape,
+                                   bc.LOAD_TAPE: self._load_tape,
+                                   bc.POP_NEXT_PUSH: self._pop_next_push,
+                                   bc.POP_PREV_PUSH: self._pop_prev_push,
+                                   bc.POP_JUMP: self._pop_jump,
+                                   bc.POP_JUMP_IF: self._pop_jump_if,
+                                   bc.POP_JUMP_IF_ELSE: self._pop_jump_if_else,
+                                   bc.RETURN: self._return,
+                                   bc.BOOL_NOT: self._bool_not,
+                                   bc.IS_DIGIT: self._is_digit,
+                                   bc.REPEAT: self._repeat,
+                                   bc.LOOP_NEXT: self._loop_next,
+                                   bc.INC_TAPE: self._inc_tape,
+                                   bc.DEC_TAPE: self._dec_tape,
+                                   bc.SWAP_BOX: self._swap_box,
+                                   bc.SET_TAPE_IMM: self._set_tape_imm,
+                                   bc.TAPE_EQ_IMM: self._tape_eq_imm,
+                                   bc.JUMP_IF_TAPE_EQ: self._jump_if_tape_eq,
+                                   bc.JUMP_IF_TAPE_NE: self._jump_if_tape_ne,
+                                   bc.CALL: self._call,
+                                   bc.MOVE_BY: self._move_by,
+                                   bc.ADD_TAPE: self._add_tape,
+                                   bc.SCAN_RIGHT_UNTIL: self._scan_right_until,
+                                   bc.SCAN_LEFT_UNTIL: self._scan_left_until,
+                                   bc.SKIP: self._skip,
+                                   bc.SKIP_IF_NOT: self._skip_if_not,
+                                   bc.SKIP_IF_TAPE_EQ: self._skip_if_tape_eq,
+                                   bc.SKIP_IF_TAPE_NE: self._skip_if_tape_ne,
+                                   bc.POP_JUMP | TAIL: self._pop_jump_tail,
+                                   bc.POP_JUMP_IF | TAIL: self._pop_jump_if_tail,
+                                   bc.POP_JUMP_IF_ELSE | TAIL: self._pop_jump_if_else_tail,
+                                   bc.REPEAT | TAIL: self._repeat_tail,
+                                   bc.CALL | TAIL: self._call_tail,
+                                   bc.JUMP_IF_TAPE_EQ | TAIL: self._jump_if_tape_eq_tail,
+                                   bc.JUMP_IF_TAPE_NE | TAIL: self._jump_if_tape_ne_tail,
+                                   }.items():
+            self.operations[command] = operation
 
     def run(self, bytecode: bytearray, command: bytearray):
         if command:
@@ -68,161 +201,641 @@ class Vm:
         else:
             return
 
-        while self.position < len(self.commands):
-            command = self.commands[self.position]
-
-            self._run_command(command[1], *command[2])
-
-    def startup(self, bytecode: bytearray, command: bytearray):
-        self.stack = []
-        self.call_stack = []
-        self.tags = {}
-        self.commands = []
+        if self.execute() is Status.ERROR:
+            raise self.error
 
-        bytes_iter = iter(bytecode)
-        command_iter = iter(command)
+    def execute(self, steps: int = None, seconds: float = None) -> Status:
+        """Продолжает выполнение команды, загруженной startup, с места последней остановки.
 
-        position = 0
+        Выполняет не больше steps команд и не дольше seconds секунд (время проверяется раз в SLICE команд).
+        Ошибка исполнителя не выбрасывается, а сохраняется в self.error.
+        """
+        deadline = None if seconds is None else time.monotonic() + seconds
+        if self.profiler is not None:
+            return self._execute_profiled(steps, deadline)
+        if self.jit:
+            return self._execute_jit(steps, deadline)
 
+        code, operations = self.code, self.operations
+        pc, end = self.position, len(code)
         try:
-            while True:
-                byte = next(bytes_iter)
-                command = (0, byte, tuple((next(bytes_iter) for _ in range(args_num[byte]))))
-
-                if command[1] == bc.TAG:  # TAG
-                    self.add_tag(_get_number(*command[2]), position)
+            while pc < end:
+                if steps is not None and steps <= 0 or deadline is not None and time.monotonic() >= deadline:
+                    return Status.BUDGET
+                chunk = SLICE if steps is None else min(SLICE, steps)
+                for i in range(chunk):
+                    pc = operations[code[pc]](pc)
+                self.steps += chunk
+                if steps is not None:
+                    steps -= chunk
+        except IndexError:  # Выход за конец программы вместо проверки pc < end на каждом шаге
+            if pc < end:
+                raise
+            self.steps += i
+        except errors.CorrectorException as e:
+            self.steps += i
+            self.error = e
+            return Status.ERROR
+        finally:
+            self.position = pc
+        return Status.FINISHED
+
+    def _execute_profiled(self, steps: int | None, deadline: float | None) -> Status:
+        """Как execute, но каждая команда учитывается в self.profiler"""
+        profiler = self.profiler
+        profiler.attach(self.code, self.tags, len(self.program))
+        code, operations, owners = self.code, self.operations, profiler.owners
+        opcodes, tags, times = profiler.opcodes, profiler.tags, profiler.times
+        clock = time.perf_counter
+        pc, end = self.position, len(code)
+        try:
+            while pc < end:
+                if steps is not None and steps <= 0 or deadline is not None and time.monotonic() >= deadline:
+                    return Status.BUDGET
+                op, tag_id = code[pc], owners[pc]
+                start = clock()
+                pc = operations[op](pc)
+                times[tag_id] += clock() - start
+                opcodes[op & ~TAIL] += 1
+                tags[tag_id] += 1
+                self.steps += 1
+                if steps is not None:
+                    steps -= 1
+                profiler.max_call_stack = max(profiler.max_call_stack, len(self.call_stack))
+                profiler.max_stack = max(profiler.max_stack, len(self.stack))
+                profiler.tape(self.tape.position)
+        except errors.CorrectorException as e:
+            self.error = e
+            return Status.ERROR
+        finally:
+            self.position = pc
+        return Status.FINISHED
+
+    def _execute_jit(self, steps: int | None, deadline: float | None) -> Status:
+        """Как execute, но с оттранслированными функциями там, где они есть и укладываются в лимит шагов"""
+        if self.blocks is None:
+            self.blocks = jit.translate(self.program, OPERANDS)
+        code, operations, blocks = self.code, self.operations, self.blocks
+        tape, stack, call_stack, loops = self.tape, self.stack, self.call_stack, self.loops
+        size = len(blocks)
+        pc, end = self.position, len(code)
+        left = start = sys.maxsize if steps is None else steps
+        check = left - SLICE  # Время проверяется примерно раз в SLICE команд
+        try:
+            while pc < end:
+                if left <= 0:
+                    return Status.BUDGET
+                if left <= check and deadline is not None:
+                    if time.monotonic() >= deadline:
+                        return Status.BUDGET
+                    check = left - SLICE
+                block = blocks[pc] if pc < size else None
+                if block is not None and block[1] <= left:
+                    pc, n = block[0](self, tape, stack, call_stack, loops, left if deadline is None else min(left, SLICE))
+                    left -= n
                 else:
-                    self.commands.append(command)
-                    position += 1
-        except StopIteration:
-            self.position = position
-            try:
-                while True:
-                    byte = next(command_iter)
-                    self.commands.append((0, byte, tuple([next(command_iter) for _ in range(args_num[byte])])))
-            except StopIteration:
-                return
+                    pc = operations[code[pc]](pc)
+                    left -= 1
+        except jit.Failure as e:
+            pc = e.pc
+            left -= e.steps
+            for ret, remaining in e.loops:
+                loops.append(remaining)
+                if ret is not None:
+                    call_stack.append(ret)
+            stack.extend(e.stack)
+            self.error = errors.CorrectorCannotError('Не могу!')
+            return Status.ERROR
+        except errors.CorrectorException as e:
+            self.error = e
+            return Status.ERROR
+        finally:
+            self.position = pc
+            self.steps += start - left
+        return Status.FINISHED
+
+    def startup(self, bytecode: bytearray, command: bytearray):
+        self.stack = []
+        self.call_stack = []
+        self.loops = []
+        self.steps = 0
+        self.error = None
+
+        if self.source is None or (bytecode is not self.source and bytecode != self.source):
+            self.program, self.program_tags = self.load(bytecode)
+            self.source = bytecode
+            self.blocks = None
+
+        self.tags = self.program_tags
+        self.code = array('i', self.program)
+        self.position = len(self.code)
+        self._decode(command, self.code, self.tags)
+
+    def use(self, program: array, tags: dict, source):
+        """Подставляет уже загруженную программу (например, из файла .korc): startup с байт-кодом source
+        её не загружает заново
+        """
+        self.program, self.program_tags, self.source = program, tags, source
+        self.blocks = None
+
+    def snapshot(self, full: bool = False) -> Snapshot:
+        """Снимок состояния. Неполный снимок содержит только ячейки, изменённые после предыдущего снимка,
+        поэтому первый снимок (до него изменения не отслеживаются) всегда полный.
+        """
+        tape = self.tape
+        if full or tape.dirty is None:
+            tape_copy, cells = tape.copy(), None
+        else:
+            tape_copy, cells = None, {position: tape.get_at(position) for position in tape.dirty}
+        tape.dirty = set()
+        return Snapshot(self.box, tuple(self.stack), tuple(self.call_stack), tuple(self.loops), self.position,
+                        self.steps, tape.position, tape_copy, cells)
+
+    def restore(self, snapshots):
+        """Восстанавливает состояние по цепочке снимков: полный снимок, за ним неполные, сделанные подряд"""
+        self.tape = snapshots[0].tape.copy()
+        for snapshot in snapshots[1:]:
+            for position, symbol in snapshot.cells.items():
+                self.tape.position = position
+                self.tape.set(symbol)
+
+        last = snapshots[-1]
+        self.tape.position = last.tape_position
+        self.tape.dirty = set()
+        self.box = last.box
+        self.stack = list(last.stack)
+        self.call_stack = list(last.call_stack)
+        self.loops = list(last.loops)
+        self.position = last.position
+        self.steps = last.steps
+        self.error = None
+
+    def load(self, bytecode: bytearray) -> tuple[array, dict]:
+        """Загрузка программы: разбор байт-кода и замена номеров тегов адресами"""
+        code = array('i')
+        tags = {}
+        fixups = []
+        self._decode(bytecode, code, tags, fixups)
+        for i in fixups:
+            code[i] = tags[code[i]]
+
+        i = 0
+        while i < len(code):
+            size = 1 + len(OPERANDS[code[i]])
+            if code[i] in CALLS and i + size < len(code) and code[i + size] == bc.RETURN:
+                code[i] |= TAIL
+            i += size
+        return code, tags
 
     def add_tag(self, tag_id: int, pos: int):
         self.tags[tag_id] = pos
 
-    def _run_command(self, command: int, *args):
-        self.operations[command](*args)
-
-        if command not in (bc.POP_JUMP, bc.POP_JUMP_IF, bc.POP_JUMP_IF_ELSE, bc.RETURN):  # Не произошло перехода
-            self.position += 1
-
-    def _load_tag(self, *args):
-        self.stack.append(_get_number(args[0], args[1]))
-
-    def _load_symbol(self, *args):
-        self.stack.append(args[0])
-
-    def _bin_op(self, *args):
-        match args[0]:
-            case bc.EQUAL:
-                self.stack.append(self.stack.pop() == self.stack.pop())
-            case bc.MORE:
-                self.stack.append(self.stack.pop() > self.stack.pop())
-            case bc.LESS:
-                self.stack.append(self.stack.pop() < self.stack.pop())
-            case bc.NOT_EQUAL:
-                self.stack.append(self.stack.pop() != self.stack.pop())
-
-    def _right(self):
+    @staticmethod
+    def _decode(bytecode, code: array, tags: dict, fixups: list = None):
+        """Дописывает команды из bytecode в code.
+
+        Если передан fixups, номера тегов записываются как есть, а их места в code добавляются в fixups.
+        Иначе номера сразу заменяются адресами из tags. Длины переходов вперёд заменяются адресами.
+        """
+        skips = []  # (место в code, смещение цели в bytecode)
+        start = len(code)
+        i, n = 0, len(bytecode)
+        while i < n:
+            op = bytecode[i]
+            if op == bc.TAG:
+                tags[(bytecode[i + 1] << 8) + bytecode[i + 2]] = len(code)
+                i += 3
+                continue
+
+            code.append(op)
+            i += 1
+            for kind in OPERANDS[op]:
+                if kind == TAG_ARG:
+                    tag = (bytecode[i] << 8) + bytecode[i + 1]
+                    if fixups is None:
+                        code.append(tags[tag])
+                    else:
+                        fixups.append(len(code))
+                        code.append(tag)
+                    i += 2
+                elif kind == NUMBER_ARG:
+                    code.append((bytecode[i] << 8) + bytecode[i + 1])
+                    i += 2
+                elif kind == SIGNED_ARG:
+                    number = (bytecode[i] << 8) + bytecode[i + 1]
+                    code.append(number - 0x10000 if number & 0x8000 else number)
+                    i += 2
+                elif kind == SKIP_ARG:  # Последний аргумент: отсчёт от конца команды
+                    skips.append((len(code), i + 2 + (bytecode[i] << 8) + bytecode[i + 1]))
+                    code.append(0)
+                    i += 2
+                else:
+                    code.append(bytecode[i])
+                    i += 1
+
+        if skips:
+            addresses = {}  # Смещение команды в bytecode -> её адрес в code
+            address, i = start, 0
+            while i < n:
+                op = bytecode[i]
+                if op == bc.TAG:
+                    i += 3
+                    continue
+                addresses[i] = address
+                address += 1 + len(OPERANDS[op])
+                i += 1 + bc.ARGS_NUM[op]
+            addresses[n] = address
+            for place, target in skips:
+                code[place] = addresses[target]
+
+    def _load_tag(self, pc: int) -> int:
+        self.stack.append(self.code[pc + 1])
+        return pc + 2
+
+    def _load_symbol(self, pc: int) -> int:
+        self.stack.append(self.code[pc + 1])
+        return pc + 2
+
+    def _bin_op(self, pc: int) -> int:
+        stack = self.stack
+        stack.append(COMPARISONS[self.code[pc + 1]](stack.pop(), stack.pop()))
+        return pc + 2
+
+    def _right(self, pc: int) -> int:
         self.tape.move_right()
+        return pc + 1
 
-    def _left(self):
+    def _left(self, pc: int) -> int:
         self.tape.move_left()
+        return pc + 1
 
-    def _pop_set_box(self):
+    def _pop_set_box(self, pc: int) -> int:
         self.box = self.stack.pop()
+        return pc + 1
 
-    def _load_box(self):
+    def _load_box(self, pc: int) -> int:
         self.stack.append(self.box)
+        return pc + 1
 
-    def _pop_set_tape(self):
+    def _pop_set_tape(self, pc: int) -> int:
         self.tape.set(self.stack.pop())
+        return pc + 1
 
-    def _load_tape(self):
+    def _load_tape(self, pc: int) -> int:
         self.stack.append(self.tape.get())
+        return pc + 1
 
-    def _pop_next_push(self):
+    def _pop_next_push(self, pc: int) -> int:
         s = self.stack.pop()
         if s == 72:
             raise errors.CorrectorCannotError('Не могу!')
         self.stack.append(s + 1)
+        return pc + 1
 
-    def _pop_prev_push(self):
+    def _pop_prev_push(self, pc: int) -> int:
         s = self.stack.pop()
-        if s == 1:
+        if s <= 1:  # 0 или ПУСТО
             raise errors.CorrectorCannotError('Не могу!')
         self.stack.append(s - 1)
+        return pc + 1
 
-    def _pop_jump(self):
-        self._jump(self.stack.pop(), self.position + 1)
+    def _pop_jump(self, pc: int) -> int:
+        self.call_stack.append(pc + 1)
+        return self.stack.pop()
 
-    def _pop_jump_if(self, *args):
+    def _pop_jump_if(self, pc: int) -> int:
         if self.stack.pop():
-            self._jump(_get_number(args[0], args[1]), self.position + 1)
-        else:
-            self.position += 1
+            self.call_stack.append(pc + 2)
+            return self.code[pc + 1]
+        return pc + 2
+
+    def _pop_jump_if_else(self, pc: int) -> int:
+        self.call_stack.append(pc + 3)
+        return self.code[pc + 1] if self.stack.pop() else self.code[pc + 2]
+
+    def _pop_jump_tail(self, pc: int) -> int:
+        return self.stack.pop()
+
+    def _pop_jump_if_tail(self, pc: int) -> int:
+        return self.code[pc + 1] if self.stack.pop() else pc + 2
+
+    def _pop_jump_if_else_tail(self, pc: int) -> int:
+        return self.code[pc + 1] if self.stack.pop() else self.code[pc + 2]
+
+    def _repeat(self, pc: int) -> int:
+        if not self.code[pc + 1]:
+            return pc + 3
+        self.loops.append(self.code[pc + 1])
+        self.call_stack.append(pc + 3)
+        return self.code[pc + 2]
+
+    def _repeat_tail(self, pc: int) -> int:
+        if not self.code[pc + 1]:
+            return pc + 3
+        self.loops.append(self.code[pc + 1])
+        return self.code[pc + 2]
+
+    def _loop_next(self, pc: int) -> int:
+        self.loops[-1] -= 1
+        if self.loops[-1]:
+            return self.code[pc + 1]
+        self.loops.pop()
+        return pc + 2
+
+    def _inc_tape(self, pc: int) -> int:
+        s = self.tape.get()
+        if s == 72:
+            raise errors.CorrectorCannotError('Не могу!')
+        self.tape.set(s + 1)
+        return pc + 1
 
-    def _pop_jump_if_else(self, *args):
-        if self.stack.pop():
-            self._jump(_get_number(args[0], args[1]), self.position + 1)
-        else:
-            self._jump(_get_number(args[2], args[3]), self.position + 1)
+    def _dec_tape(self, pc: int) -> int:
+        s = self.tape.get()
+        if s <= 1:
+            raise errors.CorrectorCannotError('Не могу!')
+        self.tape.set(s - 1)
+        return pc + 1
+
+    def _swap_box(self, pc: int) -> int:
+        box = self.box
+        self.box = self.tape.get()
+        self.tape.set(box)
+        return pc + 1
+
+    def _set_tape_imm(self, pc: int) -> int:
+        self.tape.set(self.code[pc + 1])
+        return pc + 2
+
+    def _tape_eq_imm(self, pc: int) -> int:
+        self.stack.append(self.tape.get() == self.code[pc + 1])
+        return pc + 2
+
+    def _jump_if_tape_eq(self, pc: int) -> int:
+        if self.tape.get() == self.code[pc + 1]:
+            self.call_stack.append(pc + 3)
+            return self.code[pc + 2]
+        return pc + 3
+
+    def _jump_if_tape_eq_tail(self, pc: int) -> int:
+        return self.code[pc + 2] if self.tape.get() == self.code[pc + 1] else pc + 3
+
+    def _jump_if_tape_ne(self, pc: int) -> int:
+        if self.tape.get() != self.code[pc + 1]:
+            self.call_stack.append(pc + 3)
+            return self.code[pc + 2]
+        return pc + 3
+
+    def _jump_if_tape_ne_tail(self, pc: int) -> int:
+        return self.code[pc + 2] if self.tape.get() != self.code[pc + 1] else pc + 3
+
+    def _move_by(self, pc: int) -> int:
+        self.tape.move_by(self.code[pc + 1])
+        return pc + 2
+
+    def _scan_right_until(self, pc: int) -> int:
+        # Символа нет и не будет -- цикл бесконечный: команда повторяется, стоя на месте
+        return pc + 2 if self.tape.scan_right(self.code[pc + 1]) else pc
+
+    def _scan_left_until(self, pc: int) -> int:
+        return pc + 2 if self.tape.scan_left(self.code[pc + 1]) else pc
+
+    def _skip(self, pc: int) -> int:
+        return self.code[pc + 1]
+
+    def _skip_if_not(self, pc: int) -> int:
+        return pc + 2 if self.stack.pop() else self.code[pc + 1]
+
+    def _skip_if_tape_eq(self, pc: int) -> int:
+        return self.code[pc + 2] if self.tape.get() == self.code[pc + 1] else pc + 3
+
+    def _skip_if_tape_ne(self, pc: int) -> int:
+        return self.code[pc + 2] if self.tape.get() != self.code[pc + 1] else pc + 3
+
+    def _add_tape(self, pc: int) -> int:
+        """Как k команд ПЛЮС или МИНУС подряд: при ошибке на ленте остаётся крайний допустимый символ"""
+        s = self.tape.get()
+        k = self.code[pc + 1]
+        if k > 0 and s + k > 72:
+            self.tape.set(72)
+            raise errors.CorrectorCannotError('Не могу!')
+        if k < 0 and s + k < 1:
+            if s:
+                self.tape.set(1)
+            raise errors.CorrectorCannotError('Не могу!')
+        self.tape.set(s + k)
+        return pc + 2
+
+    def _call(self, pc: int) -> int:
+        self.call_stack.append(pc + 2)
+        return self.code[pc + 1]
 
-    def _return(self):
-        self.position = self.call_stack.pop()
+    def _call_tail(self, pc: int) -> int:
+        return self.code[pc + 1]
 
-    def _bool_not(self):
+    def _return(self, pc: int) -> int:
+        return self.call_stack.pop()
+
+    def _bool_not(self, pc: int) -> int:
         self.stack.append(not self.stack.pop())
+        return pc + 1
 
-    def _is_digit(self):
+    def _is_digit(self, pc: int) -> int:
         self.stack.append(1 < self.stack.pop() < 12)  # 0 or 1, 2, 3, 4, 5...
+        return pc + 1
+
 
-    def _jump(self, tag_id: int, position: int):
-        self.call_stack.append(position)
-        self.position = self.tags[tag_id]
+class Tape:
+    """Рабочая лента исполнителя
 
+    Ячейки хранятся в одном bytearray (символ занимает байт), ячейка 0 ленты лежит в data[origin].
+    При выходе за край массив увеличивается вдвое в нужную сторону.
+    """
+    def __init__(self, size: int = 64):
+        self.data = bytearray(size)
+        self.origin = size // 2
+        self.index = self.origin  # Положение текущей ячейки в data
+        self.dirty = None  # Положения записанных ячеек (для Vm.snapshot), None -- не отслеживаются
 
-def _get_number(first_byte: int, second_byte: int) -> int:
-    return (first_byte << 8) + second_byte
+    @property
+    def position(self) -> int:
+        return self.index - self.origin
 
+    @position.setter
+    def position(self, position: int):
+        self.move_by(position - self.position)
+
+    def set(self, symbol: int):
+        self.data[self.index] = symbol
+        if self.dirty is not None:
+            self.dirty.add(self.index - self.origin)
+
+    def get(self) -> int:
+        return self.data[self.index]
+
+    def get_at(self, position: int) -> int:
+        index = self.origin + position
+        return self.data[index] if 0 <= index < len(self.data) else 0
+
+    def bounds(self) -> tuple[int, int] | None:
+        """Положения крайних непустых ячеек, None -- лента пуста"""
+        stripped = self.data.lstrip(b'\0')
+        if not stripped:
+            return None
+        first = len(self.data) - len(stripped)
+        return first - self.origin, first + len(stripped.rstrip(b'\0')) - 1 - self.origin
+
+    def copy(self) -> 'Tape':
+        tape = Tape(0)
+        tape.data, tape.origin, tape.index = bytearray(self.data), self.origin, self.index
+        return tape
+
+    def move_left(self):
+        if not self.index:
+            self._grow_left(len(self.data))
+        self.index -= 1
+
+    def move_right(self):
+        self.index += 1
+        if self.index == len(self.data):
+            self._grow_right(len(self.data))
+
+    def move_by(self, offset: int):
+        self.index += offset
+        if self.index >= len(self.data):
+            self._grow_right(max(len(self.data), self.index - len(self.data) + 1))
+        elif self.index < 0:
+            self._grow_left(max(len(self.data), -self.index))
+
+    def scan_right(self, symbol: int) -> bool:
+        """Сдвиг вправо до ближайшей ячейки с symbol (включая текущую).
+
+        Если такой ячейки нет, каретка остаётся на месте и возвращается False.
+        """
+        index = self.data.find(symbol, self.index)
+        if index >= 0:
+            self.index = index
+        elif not symbol:  # За краем массива все ячейки пусты
+            self.index = len(self.data) - 1
+            self.move_right()
+        else:
+            return False
+        return True
+
+    def scan_left(self, symbol: int) -> bool:
+        index = self.data.rfind(symbol, 0, self.index + 1)
+        if index >= 0:
+            self.index = index
+        elif not symbol:
+            self.index = 0
+            self.move_left()
+        else:
+            return False
+        return True
+
+    def get_preview(self):
+        for index in range(self.index - 5, self.index + 6):
+            yield self.data[index] if 0 <= index < len(self.data) else 0
+
+    def _grow_left(self, size: int):
+        self.data[:0] = bytes(size)
+        self.origin += size
+        self.index += size
+
+    def _grow_right(self, size: int):
+        self.data += bytes(size)
+
+
+class SparseTape:
+    """Рабочая лента из страниц по PAGE_SIZE ячеек. Страница создаётся при первой записи в неё непустого символа,
+    чтение ячейки в несозданной странице возвращает ПУСТО.
+    """
+    PAGE_BITS = 12
+    PAGE_SIZE = 1 << PAGE_BITS
+    MASK = PAGE_SIZE - 1
 
-class Tape:
-    """Рабочая лента исполнителя"""
     def __init__(self):
-        self.left_data = []
-        self.right_data = [0]
+        self.pages = {}
         self.position = 0
+        self.dirty = None
 
     def set(self, symbol: int):
-        if self.position >= 0:
-            self.right_data[self.position] = symbol
-        else:
-            self.left_data[-self.position-1] = symbol
+        if self.dirty is not None:
+            self.dirty.add(self.position)
+        page = self.pages.get(self.position >> self.PAGE_BITS)
+        if page is None:
+            if not symbol:
+                return
+            page = self.pages[self.position >> self.PAGE_BITS] = bytearray(self.PAGE_SIZE)
+        page[self.position & self.MASK] = symbol
 
     def get(self) -> int:
-        return self.right_data[self.position] if self.position >= 0 else self.left_data[-self.position-1]
+        page = self.pages.get(self.position >> self.PAGE_BITS)
+        return page[self.position & self.MASK] if page is not None else 0
+
+    def get_at(self, position: int) -> int:
+        page = self.pages.get(position >> self.PAGE_BITS)
+        return page[position & self.MASK] if page is not None else 0
+
+    def bounds(self) -> tuple[int, int] | None:
+        pages = sorted(page_no for page_no, page in self.pages.items() if any(page))
+        if not pages:
+            return None
+        first, last = self.pages[pages[0]], self.pages[pages[-1]]
+        return ((pages[0] << self.PAGE_BITS) + len(first) - len(first.lstrip(b'\0')),
+                (pages[-1] << self.PAGE_BITS) + len(last.rstrip(b'\0')) - 1)
+
+    def copy(self) -> 'SparseTape':
+        tape = SparseTape()
+        tape.pages = {page_no: bytearray(page) for page_no, page in self.pages.items()}
+        tape.position = self.position
+        return tape
 
     def move_left(self):
-        if self.position < 0  and -self.position >= len(self.left_data):
-            self.left_data.append(0)
         self.position -= 1
 
     def move_right(self):
-        if self.position == len(self.right_data) - 1:
-            self.right_data.append(0)
         self.position += 1
 
+    def move_by(self, offset: int):
+        self.position += offset
+
+    def scan_right(self, symbol: int) -> bool:
+        """Как Tape.scan_right, но по страницам: несозданная страница целиком пуста"""
+        page_no, offset = self.position >> self.PAGE_BITS, self.position & self.MASK
+        last = max(self.pages, default=page_no - 1)
+        while True:
+            page = self.pages.get(page_no)
+            if page is not None:
+                index = page.find(symbol, offset)
+                if index >= 0:
+                    self.position = (page_no << self.PAGE_BITS) + index
+                    return True
+            elif not symbol:
+                self.position = (page_no << self.PAGE_BITS) + offset
+                return True
+            elif page_no > last:
+                return False
+            page_no, offset = page_no + 1, 0
+
+    def scan_left(self, symbol: int) -> bool:
+        page_no, offset = self.position >> self.PAGE_BITS, self.position & self.MASK
+        first = min(self.pages, default=page_no + 1)
+        while True:
+            page = self.pages.get(page_no)
+            if page is not None:
+                index = page.rfind(symbol, 0, offset + 1)
+                if index >= 0:
+                    self.position = (page_no << self.PAGE_BITS) + index
+                    return True
+            elif not symbol:
+                self.position = (page_no << self.PAGE_BITS) + offset
+                return True
+            elif page_no < first:
+                return False
+            page_no, offset = page_no - 1, self.MASK
+
     def get_preview(self):
-        for pos in range(self.position-5, self.position+6):
-            if pos < 0  and -pos > len(self.left_data):
-                yield 0
-            elif pos > 0 and pos > len(self.right_data) - 1:
-                yield 0
-            else:
-                yield self.right_data[pos] if pos >= 0 else self.left_data[-pos+1]
+        position = self.position
+        for self.position in range(position - 5, position + 6):
+            yield self.get()
+        self.position = position